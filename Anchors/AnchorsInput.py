@@ -22,9 +22,10 @@ DEALINGS IN THE SOFTWARE.
 """
 
 __doc__ = """
-Anchors Input v1.3 - 30 Jul 2019
+Anchors Input v1.4 - 18 Oct 2026
 
-Updates print commands to use python 3 syntax.
+Only the glyphs whose anchors differ from the file's are modified and updated.
+The parsed anchors file is cached next to it, for faster reloading.
 
 Anchors Input v1.2 - 27 Jun 2017
 
@@ -37,6 +38,7 @@ columns that follow this format:
 
 ==================================================
 Versions:
+v1.4 - 18 Oct 2026 - Only updates the glyphs whose anchors changed; caches the parsed file
 v1.3 - 30 Jul 2019 - Updates print commands to use python 3 syntax
 v1.2 - 27 Jun 2017 - Support comments and ignore blank lines
 v1.1 - 26 Apr 2016 - Use the same file naming logic as the derivedchars files
@@ -46,10 +48,24 @@ v1.0 - 21 Feb 2013 - Initial release
 #----------------------------------------
 
 kAnchorsFileName = "anchors"
+kUseAnchorsCache = True # Keep a copy of the parsed file next to it, for faster reloading
+kOnlyUpdateChangedGlyphs = True # If False, all anchors are removed and then added again
+kFamilyAnchorsFileName = "anchors_family" # Used by the --family option of the command line
 
 #----------------------------------------
 
 import os
+import sys
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.anchors_cache import cached_parse
+from shared.anchors_family import family_folder, find_masters, master_names, master_rows, read_family_file
+from shared.anchors_file import read_records
+from shared.batch import print_summary, run_batch
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.notifications import GlyphChangeBatch
+from shared.profiling import configure_profiling, count, phase, profiled
 
 
 class myAnchor:
@@ -60,87 +76,269 @@ class myAnchor:
 		self.y = y
 
 
-def readFile(filePath):
-	file = open(filePath, 'r')
-	fileContent = file.read().splitlines()
-	file.close()
-	return fileContent
+def reportMissingGlyph(glyphName, missingGlyphs):
+	"""Prints that the glyph isn't in the font, or adds its name to the
+	missingGlyphs list if one is given."""
+	if missingGlyphs is None:
+		print('ERROR: Glyph %s not found in the font.' % glyphName)
+	elif glyphName not in missingGlyphs:
+		missingGlyphs.append(glyphName)
+
+
+def reportLineError(message, errors):
+	"""Prints the problem of a line of an anchors file, or adds it to the
+	errors list if one is given."""
+	if errors is None:
+		print('ERROR: %s. Skipped.' % message)
+	else:
+		errors.append(message)
+
+
+def applyAnchorsDiff(font, anchorsList, missingGlyphs=None):
+	"""Gives each glyph the same anchors (in the same order) as it would get
+	by removing all the anchors and adding those in anchorsList, but only
+	modifies and updates the glyphs whose anchors are actually different.
+	If a missingGlyphs list is given, the names of the glyphs that aren't in
+	the font are added to it, and nothing is printed."""
+	newAnchorsDict = {} # key is glyph name; value is list of (name, x, y) tuples
+	for anchor in anchorsList:
+		if anchor.parent not in newAnchorsDict:
+			newAnchorsDict[anchor.parent] = []
+		newAnchorsDict[anchor.parent].append((anchor.name, anchor.x, anchor.y))
+
+	# Find the glyphs to modify first, so that only their edits are batched
+	changedGlyphs = []
+	for glyph in font:
+		newAnchors = newAnchorsDict.pop(glyph.name, [])
+		currentAnchors = [(anchor.name, anchor.x, anchor.y) for anchor in glyph.anchors]
+		if currentAnchors != newAnchors:
+			changedGlyphs.append((glyph, len(currentAnchors), newAnchors))
+
+	if changedGlyphs:
+		with GlyphChangeBatch() as batch:
+			for glyph, currentCount, newAnchors in changedGlyphs:
+				batch.will_change(glyph)
+				if currentCount:
+					glyph.clearAnchors()
+				for anchorName, anchorX, anchorY in newAnchors:
+					glyph.appendAnchor(anchorName, (anchorX, anchorY))
+	changedCount = len(changedGlyphs)
+
+	# The glyphs left are not in the font
+	for anchor in anchorsList:
+		if anchor.parent in newAnchorsDict:
+			reportMissingGlyph(anchor.parent, missingGlyphs)
+
+	if missingGlyphs is None:
+		print('%d glyphs were updated.' % changedCount)
+	return changedCount
 
 
-def run(font, masterNumber):
+def run(font, masterNumber, folderPath=''):
+	"""Returns the number of glyphs that were modified."""
 
 	if masterNumber:
 		filePath = "%s_%s" % (kAnchorsFileName, masterNumber)
 	else:
 		filePath = kAnchorsFileName
+	filePath = os.path.join(folderPath, filePath)
 
 	if not os.path.isfile(filePath):
 		print('ERROR: File %s not found.' % filePath)
-		return
+		return 0
 
 	print('Reading file %s ...' % filePath)
-	anchorsData = readFile(filePath)
-	anchorsList = []
-
-	for lineIndex in range(len(anchorsData)):
-		stripped_line = anchorsData[lineIndex].strip()
-
-		# skip comments and blank lines
-		if (not stripped_line) or (stripped_line.startswith('#')):
-			continue
-
-		anchorValuesList = anchorsData[lineIndex].split('\t')
-		if len(anchorValuesList) != 4: # Four columns: glyph name, anchor name, anchor X postion, anchor Y postion
-			print('ERROR: Line #%d does not have 4 columns. Skipped.' % (lineIndex +1))
-			continue
+	with phase('parse'):
+		if kUseAnchorsCache:
+			anchorsData = cached_parse(filePath, 'input', readAnchorsFile)
+		else:
+			anchorsData = readAnchorsFile(filePath)
+		anchorsList = [myAnchor(*values) for values in anchorsData]
 
-		glyphName = anchorValuesList[0]
-		anchorName = anchorValuesList[1]
+	with phase('apply'):
+		changedCount = applyAnchors(font, anchorsList)
+	count('glyphs_touched', changedCount)
+	print('Done!')
+	return changedCount
 
-		if not len(glyphName) or not len(anchorName):
-			print('ERROR: Line #%d has no glyph name or no anchor name. Skipped.' % (lineIndex +1))
-			continue
 
-		try:
-			anchorX = int(anchorValuesList[2])
-			anchorY = int(anchorValuesList[3])
-		except:
-			print('ERROR: Line #%d has an invalid anchor position value. Skipped.' % (lineIndex +1))
-			continue
+def readAnchorsFile(filePath):
+	"""Returns a list of (glyph name, anchor name, X, Y) tuples with the valid
+	lines of an anchors file."""
+	anchorsData = []
+	# Four columns: glyph name, anchor name, anchor X postion, anchor Y postion
+	for record in read_records(filePath, 4, 4):
+		newAnchor = makeAnchor(record.line_number, record.glyph_name, record.anchor_name, record.values[0], record.values[1])
+		if newAnchor is not None:
+			anchorsData.append((newAnchor.parent, newAnchor.name, newAnchor.x, newAnchor.y))
+	return anchorsData
 
-		newAnchor = myAnchor(glyphName, anchorName, anchorX, anchorY)
-		anchorsList.append(newAnchor)
 
+def makeAnchor(lineNumber, glyphName, anchorName, anchorX, anchorY, errors=None):
+	"""Returns a myAnchor made from the values of a line of an anchors file,
+	or None (after reporting the problem, see reportLineError) if they
+	aren't valid."""
+	if not len(glyphName) or not len(anchorName):
+		reportLineError('Line #%d has no glyph name or no anchor name' % lineNumber, errors)
+		return None
 
-	if not len(anchorsList):
-		print('No valid anchors data was found.')
-		return
+	try:
+		anchorX = int(anchorX)
+		anchorY = int(anchorY)
+	except:
+		reportLineError('Line #%d has an invalid anchor position value' % lineNumber, errors)
+		return None
 
+	return myAnchor(glyphName, anchorName, anchorX, anchorY)
 
-	# Remove all anchors
-	for glyph in font:
-		if len(glyph.anchors) > 0:
-			glyph.clearAnchors()
-			glyph.glyphChangedUpdate()
 
+def applyAnchors(font, anchorsList, missingGlyphs=None):
+	"""Replaces the anchors of the font by those in anchorsList.
+	Returns the number of glyphs that were modified. If a missingGlyphs list
+	is given, the names of the glyphs that aren't in the font are added to
+	it, and nothing is printed."""
 
-	# Add all anchors
-	for anchor in anchorsList:
-		# Make sure that the glyph exists
-		if font.has_key(anchor.parent):
-			glyph = font[anchor.parent]
-		else:
-			print('ERROR: Glyph %s not found in the font.' % anchor.parent)
-			continue
+	if not len(anchorsList):
+		if missingGlyphs is None:
+			print('No valid anchors data was found.')
+		return 0
+
+
+	if kOnlyUpdateChangedGlyphs:
+		return applyAnchorsDiff(font, anchorsList, missingGlyphs)
+
+
+	with GlyphChangeBatch() as batch:
+		# Remove all anchors
+		for glyph in font:
+			if len(glyph.anchors) > 0:
+				batch.will_change(glyph)
+				glyph.clearAnchors()
+
+
+		# Add all anchors
+		for anchor in anchorsList:
+			# Make sure that the glyph exists
+			if font.has_key(anchor.parent):
+				glyph = font[anchor.parent]
+			else:
+				reportMissingGlyph(anchor.parent, missingGlyphs)
+				continue
+
+			batch.will_change(glyph)
+			glyph.appendAnchor(anchor.name, (anchor.x, anchor.y))
+# 			glyph.mark = 125
+
+	return len(batch)
+
+
+def importMasterAnchors(fontPath, familyData):
+	"""Applies one master's columns of a family anchors file to the master,
+	and saves it. Runs in a worker process when more than one job is used,
+	so nothing is printed: the glyphs that aren't in the master and the
+	problems of the lines are returned, for print_summary to report."""
+	masterIndices, rows = familyData
+	masterIndex = masterIndices[fontPath]
+	missingGlyphs = []
+	errors = []
+
+	with profiled('AnchorsInput', fontPath):
+		anchorsList = []
+		with phase('parse'):
+			for lineNumber, glyphName, anchorName, anchorX, anchorY in master_rows(rows, masterIndex):
+				newAnchor = makeAnchor(lineNumber, glyphName, anchorName, anchorX, anchorY, errors)
+				if newAnchor is not None:
+					anchorsList.append(newAnchor)
+
+		with phase('load'):
+			font = open_font(fontPath)
+		with phase('apply'):
+			changedCount = applyAnchors(font, anchorsList, missingGlyphs)
+		count('glyphs_touched', changedCount)
+		if changedCount:
+			with phase('save'):
+				font.save()
+	return changedCount, [], missingGlyphs, errors
+
+
+def runFamily(familyPath, jobs=1):
+	"""Reads the family anchors file of a designspace file or of a folder of
+	UFOs, and applies it to all the masters at once."""
+	masters = find_masters(familyPath)
+	familyFolder = family_folder(familyPath)
+	filePath = os.path.join(familyFolder, kFamilyAnchorsFileName)
 
-		glyph.appendAnchor(anchor.name, (anchor.x, anchor.y))
-		glyph.glyphChangedUpdate()
-# 		glyph.mark = 125
+	if not os.path.isfile(filePath):
+		print('ERROR: File %s not found.' % filePath)
+		return 1
 
+	with profiled('AnchorsInput', familyPath):
+		print('Reading file %s ...' % filePath)
+		try:
+			with phase('parse'):
+				fileMasters, rows = read_family_file(filePath)
+			masterNames = master_names(masters, familyFolder)
+		except ValueError as error:
+			print('ERROR: %s' % error)
+			return 1
+
+		masterIndices = {}
+		for fontPath, masterName in zip(masters, masterNames):
+			if masterName in fileMasters:
+				masterIndices[fontPath] = fileMasters.index(masterName)
+			else:
+				print('ERROR: Master %s is not in the file. Skipped.' % masterName)
+
+		results = run_batch(importMasterAnchors, list(masterIndices), (masterIndices, rows), jobs)
+	status = print_summary(results, '%d glyphs were updated')
 	print('Done!')
+	return status
+
+
+def getMasterNumber(fontPath):
+	"""Returns the index of the master, taken from the font's file name
+	(e.g. '2' for 'MyFont_2.ufo'), or None."""
+	fileNameNoExtension, fileExtension = os.path.splitext(os.path.basename(os.path.normpath(fontPath)))
+	masterNumber = fileNameNoExtension.split('_')[-1]
+
+	if not masterNumber.isdigit():
+		masterNumber = None
+	return masterNumber
+
+
+def main(args=None):
+	"""Headless entry point; reads each font's anchors file and saves the fonts
+	that changed."""
+	parser = font_arguments_parser(__doc__, fonts_required=False)
+	parser.add_argument('--family', metavar='PATH',
+						help='designspace file or folder of UFOs whose masters '
+						'are all updated from one %s file' % kFamilyAnchorsFileName)
+	parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+						help='number of masters to process at once in family mode')
+	options = parser.parse_args(args)
+	configure_profiling(options)
+
+	if options.family:
+		return runFamily(options.family, options.jobs)
+	if not options.fonts:
+		parser.error('no fonts were provided')
+
+	for fontPath in options.fonts:
+		print(os.path.basename(os.path.normpath(fontPath)))
+		with profiled('AnchorsInput', fontPath):
+			with phase('load'):
+				font = open_font(fontPath)
+			folderPath = os.path.dirname(os.path.abspath(fontPath))
+			if run(font, getMasterNumber(fontPath), folderPath):
+				with phase('save'):
+					font.save()
+	return 0
 
 
 if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
+
 	font = CurrentFont()
 	if font == None:
 		print('Open a font first.')
@@ -151,11 +349,8 @@ if __name__ == "__main__":
 			print('The font has no glyphs.')
 		else:
 			folderPath, fileName = os.path.split(font.path)
-			fileNameNoExtension, fileExtension = os.path.splitext(fileName)
-			masterNumber = fileNameNoExtension.split('_')[-1]
-
-			if not masterNumber.isdigit():
-				masterNumber = None
+			masterNumber = getMasterNumber(font.path)
 
 			os.chdir(folderPath) # Change current directory to the location of the opened font
-			run(font, masterNumber)
+			with profiled('AnchorsInput', font.path):
+				run(font, masterNumber)
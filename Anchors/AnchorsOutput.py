@@ -22,9 +22,10 @@ DEALINGS IN THE SOFTWARE.
 """
 
 __doc__ = """
-Anchors Input v1.3 - 30 Jul 2019
+Anchors Output v1.4 - 18 Oct 2026
 
-Updates print commands to use python 3 syntax.
+Writes the anchor data while walking the glyphs, instead of collecting it
+all first. The file can optionally be gzip-compressed.
 
 Anchors Output v1.1 - 26 Apr 2016
 
@@ -34,6 +35,7 @@ where 'X' represents the index of the font master, counting from 0.
 
 ==================================================
 Versions:
+v1.4 - 18 Oct 2026 - Streams the output; optional gzip compression; can be run outside of RoboFont
 v1.3 - 30 Jul 2019 - Updates print commands to use python 3 syntax
 v1.1 - 26 Apr 2016 - Use the same file naming logic as the derivedchars files
 v1.0 - 21 Feb 2013 - Initial release
@@ -42,56 +44,218 @@ v1.0 - 21 Feb 2013 - Initial release
 #----------------------------------------
 
 kAnchorsFileName = "anchors"
+kCompressOutput = False # If True, the file is gzip-compressed, and '.gz' is appended to its name
+kRowsPerChunk = 4096 # Number of lines collected before each write
+kFamilyAnchorsFileName = "anchors_family" # Used by the --family option of the command line
 
 #----------------------------------------
 
+import gzip
 import os
+import sys
 
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.anchors_family import family_folder, find_masters, master_names, merge_master_anchors, write_family_file
+from shared.batch import run_batch
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.profiling import configure_profiling, count, phase, profiled
 
-def run(font, masterNumber):
 
-	anchorsList = []
+class AnchorsFileWriter:
+	"""Writes lines to a temporary file, in chunks of kRowsPerChunk lines.
+	The file is only created when the first line is written, and is only
+	given its final name by close()."""
+	def __init__(self, filePath, compress=False):
+		if compress:
+			filePath += '.gz'
+		self.filePath = filePath
+		self.tempPath = filePath + '.tmp'
+		self.compress = compress
+		self.file = None
+		self.chunk = []
+		self.lineCount = 0
 
-	glyphOrder = font.lib['public.glyphOrder']
-	if len(glyphOrder) != len(font.keys()):
-		glyphOrder = font.keys()
+	def write(self, line):
+		self.chunk.append(line)
+		self.lineCount += 1
+		if len(self.chunk) >= kRowsPerChunk:
+			self.flush()
 
-	# Collect anchors data
-	for glyphName in glyphOrder:
-		glyph = font[glyphName]
+	def flush(self):
+		if not self.chunk:
+			return
+		if self.file is None:
+			print('Writing file %s ...' % self.filePath)
+			if self.compress:
+				self.file = gzip.open(self.tempPath, 'wt')
+			else:
+				self.file = open(self.tempPath, 'w')
+		self.file.writelines(self.chunk)
+		del self.chunk[:]
 
-		for anchorIndex in range(len(glyph.anchors)):
-			anchor = glyph.anchors[anchorIndex]
+	def close(self):
+		self.flush()
+		if self.file is not None:
+			self.file.close()
+			os.replace(self.tempPath, self.filePath)
 
+
+def getGlyphOrder(font):
+	glyphNames = font.keys()
+	glyphOrder = font.lib.get('public.glyphOrder', [])
+	if len(glyphOrder) != len(glyphNames):
+		glyphOrder = glyphNames
+	return glyphOrder
+
+
+def iterAnchors(font):
+	"""Yields a (glyphName, anchorName, x, y) tuple for each anchor,
+	in glyph order."""
+	for glyphName in getGlyphOrder(font):
+		for anchor in font[glyphName].anchors:
 			# Skip nameless anchors
 			if not len(anchor.name):
 				print('ERROR: Glyph %s has a nameless anchor. Skipped.' % glyphName)
 				continue
 
-			anchorData = "%s\t%s\t%d\t%d\n" % (glyphName, anchor.name, anchor.x, anchor.y)
+			yield glyphName, anchor.name, anchor.x, anchor.y
 
-			anchorsList.append(anchorData)
 
+def run(font, masterNumber, folderPath='', compress=kCompressOutput):
 
-	if not len(anchorsList):
-		print('The font has no anchors.')
-		return
-
-
-	# Write file
 	if masterNumber:
 		filename = "%s_%s" % (kAnchorsFileName, masterNumber)
 	else:
 		filename = kAnchorsFileName
-	print('Writing file %s ...' % filename)
-	outfile = open(filename, 'w')
-	outfile.writelines(anchorsList)
-	outfile.close()
+	filename = os.path.join(folderPath, filename)
+
+	writer = AnchorsFileWriter(filename, compress)
+	try:
+		with phase('save'):
+			for glyphName, anchorName, anchorX, anchorY in iterAnchors(font):
+				writer.write("%s\t%s\t%d\t%d\n" % (glyphName, anchorName, anchorX, anchorY))
+
+			writer.close()
+	finally:
+		if writer.file is not None and not writer.file.closed:
+			writer.file.close()
+		if os.path.exists(writer.tempPath):
+			os.remove(writer.tempPath)
+	count('anchors_written', writer.lineCount)
+
+
+	if not writer.lineCount:
+		print('The font has no anchors.')
+		return
 
 	print('Done!')
 
 
+def exportMasterAnchors(fontPath, unused):
+	"""Returns the anchors of a master. Runs in a worker process when more
+	than one job is used."""
+	with profiled('AnchorsOutput', fontPath):
+		with phase('load'):
+			font = open_font(fontPath)
+		with phase('apply'):
+			anchors = list(iterAnchors(font))
+		count('anchors_written', len(anchors))
+	return anchors
+
+
+def runFamily(familyPath, jobs=1):
+	"""Writes the anchors of all the masters of a designspace file or of a
+	folder of UFOs to one family anchors file."""
+	masters = find_masters(familyPath)
+	if not masters:
+		print('ERROR: No masters found in %s.' % familyPath)
+		return 1
+	familyFolder = family_folder(familyPath)
+	try:
+		masterNames = master_names(masters, familyFolder)
+	except ValueError as error:
+		print('ERROR: %s' % error)
+		return 1
+
+	with profiled('AnchorsOutput', familyPath):
+		results = run_batch(exportMasterAnchors, masters, None, jobs)
+		with phase('save'):
+			status = writeFamilyFile(familyFolder, masterNames, results)
+	return status
+
+
+def writeFamilyFile(familyFolder, masterNames, results):
+	"""Merges the anchors exported from the masters into the family anchors
+	file. masterNames holds the names of the masters, in the order of the
+	results. Returns 1 if a master couldn't be read, 0 otherwise."""
+	for result in results:
+		if result.error is not None:
+			print('ERROR: %s could not be processed.' % result.path)
+			print('  ' + result.error)
+			return 1
+
+	rows = merge_master_anchors([result.value for result in results])
+	if not len(rows):
+		print('The fonts have no anchors.')
+		return 0
+
+	# Check the anchors' compatibility across masters
+	for glyphName, anchorName, positions in rows:
+		missingCount = positions.count(None)
+		if missingCount:
+			print('WARNING: Anchor %s of glyph %s is missing from %d of %d masters.' % (anchorName, glyphName, missingCount, len(positions)))
+
+	filePath = os.path.join(familyFolder, kFamilyAnchorsFileName)
+	print('Writing file %s ...' % filePath)
+	write_family_file(filePath, masterNames, rows)
+	print('Done!')
+	return 0
+
+
+def getMasterNumber(fontPath):
+	"""Returns the index of the master, taken from the font's file name
+	(e.g. '2' for 'MyFont_2.ufo'), or None."""
+	fileNameNoExtension, fileExtension = os.path.splitext(os.path.basename(os.path.normpath(fontPath)))
+	masterNumber = fileNameNoExtension.split('_')[-1]
+
+	if not masterNumber.isdigit():
+		masterNumber = None
+	return masterNumber
+
+
+def main(args=None):
+	"""Headless entry point; writes an anchors file next to each font."""
+	parser = font_arguments_parser(__doc__, fonts_required=False)
+	parser.add_argument('--gzip', action='store_true', default=kCompressOutput,
+						help='write gzip-compressed anchors files')
+	parser.add_argument('--family', metavar='PATH',
+						help='designspace file or folder of UFOs whose masters '
+						'are all written to one %s file' % kFamilyAnchorsFileName)
+	parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+						help='number of masters to load at once in family mode')
+	options = parser.parse_args(args)
+	configure_profiling(options)
+
+	if options.family:
+		return runFamily(options.family, options.jobs)
+	if not options.fonts:
+		parser.error('no fonts were provided')
+
+	for fontPath in options.fonts:
+		print(os.path.basename(os.path.normpath(fontPath)))
+		with profiled('AnchorsOutput', fontPath):
+			with phase('load'):
+				font = open_font(fontPath)
+			folderPath = os.path.dirname(os.path.abspath(fontPath))
+			run(font, getMasterNumber(fontPath), folderPath, options.gzip)
+	return 0
+
+
 if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
+
 	font = CurrentFont()
 	if font == None:
 		print('Open a font first.')
@@ -102,11 +266,8 @@ if __name__ == "__main__":
 			print('The font has no glyphs.')
 		else:
 			folderPath, fileName = os.path.split(font.path)
-			fileNameNoExtension, fileExtension = os.path.splitext(fileName)
-			masterNumber = fileNameNoExtension.split('_')[-1]
-
-			if not masterNumber.isdigit():
-				masterNumber = None
+			masterNumber = getMasterNumber(font.path)
 
 			os.chdir(folderPath) # Change current directory to the location of the opened font
-			run(font, masterNumber)
+			with profiled('AnchorsOutput', font.path):
+				run(font, masterNumber)
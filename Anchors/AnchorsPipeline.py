@@ -0,0 +1,225 @@
+"""
+Takes in an ordered list of DeleteAnchors, RenameAnchors and PlaceAnchors
+files plus one (or more) UFOs, and applies them all to each font in turn,
+e.g. deleting old anchors, renaming others, then placing new ones:
+
+    python AnchorsPipeline.py --delete old.txt --rename names.txt \
+        --place new.txt MyFont_0.ufo MyFont_1.ufo
+
+The stages run in the order of the options, on one copy of the font in
+memory, and the glyphs modified by any of them are written once at the end.
+If a stage fails (an error is raised, or PlaceAnchors can't place an
+anchor), nothing is written to that font. If writing the glyphs fails,
+the files already written are restored to their previous contents.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+from fontTools.ufoLib import UFOReader
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import DeleteAnchors
+import PlaceAnchors
+import RenameAnchors
+from shared.anchors_cache import write_atomically
+from shared.batch import add_batch_arguments, open_checkpoint, parse_batch_arguments, print_summary, run_batch
+from shared.bounds_cache import BoundsCache
+from shared.font_access import open_ufo
+from shared.profiling import configure_profiling, phase, profiled
+from shared.ufo_save import save_glyphs
+
+
+# operation name -> (module, past participle used in the summary)
+OPERATIONS = {
+    'delete': (DeleteAnchors, 'deleted'),
+    'rename': (RenameAnchors, 'renamed'),
+    'place': (PlaceAnchors, 'placed'),
+}
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails, to leave the font unmodified."""
+
+
+class Stage(object):
+    """One operation of the pipeline, with its parsed anchors file."""
+
+    def __init__(self, operation, file_path, anchors):
+        self.operation = operation
+        self.file_path = file_path
+        self.anchors = anchors
+
+    def apply(self, font, opts, bounds_cache=None):
+        """Edits the font in memory, without writing anything. Returns the
+           same tuple as the operation's function. Raises PipelineError if
+           the stage failed. bounds_cache is the BoundsCache used by
+           PlaceAnchors, which the caller saves."""
+        errors = []
+        try:
+            if self.operation == 'delete':
+                result = DeleteAnchors.delete_anchors(
+                    font, self.anchors, dry_run=True)
+            elif self.operation == 'rename':
+                result = RenameAnchors.rename_anchors(
+                    font, self.anchors, dry_run=True)
+            else:
+                result = PlaceAnchors.place_anchors(
+                    font, self.anchors, dry_run=True,
+                    use_cache=opts.use_cache, errors=errors,
+                    bounds_cache=bounds_cache)
+        except Exception as exc:
+            errors.append('%s: %s' % (type(exc).__name__, exc))
+        if errors:
+            raise PipelineError('%s stage (%s) failed: %s' % (
+                self.operation, self.file_path, '; '.join(errors)))
+        return result
+
+
+def _snapshot_glyph_files(font, glyph_names):
+    """Returns a dict mapping the paths of the files of the default layer
+       that saving glyph_names may write, to their current contents (None
+       for the files that don't exist yet)."""
+    reader = UFOReader(font.path, validate=False)
+    try:
+        glyph_set = reader.getGlyphSet(validateRead=False)
+        layer_folder = os.path.join(font.path, glyph_set.dirName)
+        file_names = ['contents.plist', 'layerinfo.plist']
+        file_names.extend(glyph_set.contents[glyph_name]
+                          for glyph_name in glyph_names
+                          if glyph_name in glyph_set.contents)
+    finally:
+        reader.close()
+
+    snapshot = {}
+    for file_name in file_names:
+        file_path = os.path.join(layer_folder, file_name)
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as glyph_file:
+                snapshot[file_path] = glyph_file.read()
+        else:
+            snapshot[file_path] = None
+    return snapshot
+
+
+def _restore_glyph_files(snapshot):
+    for file_path, data in snapshot.items():
+        if data is not None:
+            write_atomically(file_path, data)
+        elif os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def save_transaction(font, glyph_names):
+    """Writes the glyphs, restoring the files already written if writing
+       one of them fails. Returns the sorted list of their names."""
+    if font.path is None or not os.path.isdir(font.path):
+        return save_glyphs(font, glyph_names)
+
+    snapshot = _snapshot_glyph_files(font, glyph_names)
+    try:
+        return save_glyphs(font, glyph_names)
+    except Exception:
+        _restore_glyph_files(snapshot)
+        raise
+
+
+def run_pipeline(font, stages, opts):
+    """Applies the stages to the font in order, then writes the glyphs
+       they modified and the bounds cache of PlaceAnchors, unless
+       opts.dry_run is True. Returns a tuple of the counts of each stage,
+       the sorted list of the names of the modified glyphs, and the sorted
+       list of the glyph names that aren't in the font. Raises
+       PipelineError, having written nothing, if a stage failed."""
+    counts = []
+    modified_glyphs = set()
+    missing = set()
+    bounds_cache = None
+    if opts.use_cache and any(stage.operation == 'place' for stage in stages):
+        bounds_cache = BoundsCache(font)
+    for stage in stages:
+        stage_count, glyph_names, missing_names = stage.apply(
+            font, opts, bounds_cache)
+        counts.append(stage_count)
+        modified_glyphs.update(glyph_names)
+        missing.update(missing_names)
+
+    if opts.dry_run:
+        written = sorted(modified_glyphs)
+    else:
+        written = save_transaction(font, modified_glyphs)
+        if bounds_cache is not None:
+            bounds_cache.save()
+    return tuple(counts), written, sorted(missing)
+
+
+def process_font(path, job):
+    stages, opts = job
+    with profiled('AnchorsPipeline', path):
+        with phase('load'):
+            font = open_ufo(path, opts.lazy)
+        return run_pipeline(font, stages, opts)
+
+
+class _StageAction(argparse.Action):
+    """Appends (operation, file path) to opts.stages, keeping the order of
+       the options on the command line."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        stages = getattr(namespace, self.dest, None) or []
+        stages.append((option_string.lstrip('-'), values))
+        setattr(namespace, self.dest, stages)
+
+
+def get_options(args):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    for operation in ('delete', 'rename', 'place'):
+        parser.add_argument(
+            '--%s' % operation, dest='stages', action=_StageAction,
+            metavar='FILE',
+            help='%s the anchors listed in FILE (in the format of %s)' % (
+                operation, OPERATIONS[operation][0].__name__))
+    parser.add_argument('fonts', nargs='*', metavar='font',
+                        help='path to a UFO font')
+    add_batch_arguments(parser)
+    opts = parse_batch_arguments(parser, args)
+    if not opts.stages:
+        parser.error('no anchors files were provided')
+    if opts.direct:
+        parser.error('--direct is not supported by the pipeline')
+    return opts
+
+
+def main(args=None):
+    opts = get_options(args)
+    configure_profiling(opts)
+
+    with profiled('AnchorsPipeline'):
+        stages = []
+        with phase('parse'):
+            for operation, file_path in opts.stages:
+                module = OPERATIONS[operation][0]
+                stages.append(Stage(operation, file_path, module.parse_anchors_file(
+                    file_path, opts.use_cache)))
+
+        checkpoint = open_checkpoint(
+            opts, 'AnchorsPipeline %s' % ' '.join(
+                stage.operation for stage in stages),
+            *[stage.file_path for stage in stages])
+        results = run_batch(
+            process_font, opts.fonts, (stages, opts), opts.jobs, checkpoint)
+    message = ', '.join('%%d anchors %s' % OPERATIONS[stage.operation][1]
+                        for stage in stages)
+    status = print_summary(results, message, opts.dry_run)
+
+    print('Done!')
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
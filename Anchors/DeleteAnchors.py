@@ -5,85 +5,112 @@ The anchors' coordinates are ignored.
 """
 from __future__ import print_function
 
+import argparse
 import os
 import sys
 
-from defcon import Font
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.anchors_cache import cached_parse
+from shared.anchors_file import build_index, read_records
+from shared.batch import add_batch_arguments, open_checkpoint, parse_batch_arguments, print_summary, run_batch
+from shared.font_access import FontGlyphs, open_ufo
+from shared.glif_anchors import patch_font_anchors
+from shared.profiling import configure_profiling, count, phase, profiled
+from shared.ufo_save import save_glyphs
 
 
-def readFile(filePath):
-    file = open(filePath, 'r')
-    fileContent = file.read().splitlines()
-    file.close()
-    return fileContent
-
-
-def delete_anchors(font, anchors):
+def delete_anchors(font, anchors, dry_run=False):
     """anchors is a dict in the form
-       {'glyph_name': ['anchor_name_1', 'anchor_name_2']}"""
+       {'glyph_name': ['anchor_name_1', 'anchor_name_2']}
+       Writes the glyphs that were modified back to the UFO (unless dry_run
+       is True), and returns the count of anchors deleted, the list of the
+       names of the modified glyphs and the list of the glyph names that
+       aren't in the font."""
 
     deleted_count = 0
-
-    for gname, anchor_names in anchors.items():
-        if gname not in font.keys():
-            continue
-        glyph = font[gname]
-        for anchor in glyph.anchors:
-            if anchor.name in anchor_names:
-                glyph.removeAnchor(anchor)
-                deleted_count += 1
-
-    if deleted_count:
-        font.save()
-        print(os.path.basename(font.path))
-        print('  %d anchors deleted' % deleted_count)
-
-
-def parse_anchors_file(file_path):
-    anchors_data = readFile(file_path)
+    modified_glyphs = set()
+    glyphs = FontGlyphs(font)
+
+    with phase('apply'):
+        for gname in glyphs.resolve(anchors):
+            anchor_names = anchors[gname]
+            glyph = glyphs[gname]
+            for anchor in glyph.anchors:
+                if anchor.name in anchor_names:
+                    glyph.removeAnchor(anchor)
+                    deleted_count += 1
+                    modified_glyphs.add(gname)
+    count('glyphs_touched', len(modified_glyphs))
+
+    written = save_glyphs(font, modified_glyphs, dry_run=dry_run)
+    return deleted_count, written, glyphs.missing
+
+
+def delete_glif_anchors(glif_anchors, anchor_names):
+    """Deletes the anchors of a .glif file (see shared.glif_anchors)
+       whose names are in anchor_names, and returns their count."""
+    kept = [anchor for anchor in glif_anchors
+            if anchor.name not in anchor_names]
+    deleted_count = len(glif_anchors) - len(kept)
+    glif_anchors[:] = kept
+    return deleted_count
+
+
+def process_font(path, job):
+    anchors, opts = job
+    with profiled('DeleteAnchors', path):
+        if opts.direct:
+            return patch_font_anchors(
+                path, anchors, delete_glif_anchors, delete_anchors,
+                opts.dry_run, opts.lazy)
+        with phase('load'):
+            font = open_ufo(path, opts.lazy)
+        return delete_anchors(font, anchors, opts.dry_run)
+
+
+def parse_anchors_file(file_path, use_cache=True):
+    """Returns the anchors dict of the file, from its sidecar cache if
+       possible (and use_cache is True)."""
+    if use_cache:
+        return cached_parse(file_path, 'delete', _parse_anchors_file)
+    return _parse_anchors_file(file_path)
+
+
+def _parse_anchors_file(file_path):
+    index = build_index(read_records(file_path, min_columns=2))
     anchors_dict = {}
 
-    for index, line in enumerate(anchors_data):
-        stripped_line = line.strip()
-        # skip comments and blank lines
-        if (not stripped_line) or (stripped_line.startswith('#')):
-            continue
-
-        anchor_info = line.split('\t')
-        if len(anchor_info) < 2: # Four columns: glyph name, anchor name, anchor X postion, anchor Y postion
-            print("ERROR: Line #%d doesn't have at least 2 columns. Skipped." % (index +1))
-            continue
-
-        glyph_name, anchor_name = anchor_info[:2]
-
-        if glyph_name not in anchors_dict:
-            anchors_dict[glyph_name] = [anchor_name]
-        else:
-            anchors_dict[glyph_name] += [anchor_name]
+    for glyph_name, records in index.items():
+        anchors_dict[glyph_name] = [record.anchor_name for record in records]
 
     return anchors_dict
 
 
-def main(args=None):
-    if args is None:
-        args = sys.argv[1:]
+def get_options(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('anchors_file', help='path to the anchors file')
+    parser.add_argument('fonts', nargs='*', metavar='font',
+                        help='path to a UFO font')
+    add_batch_arguments(parser)
+    return parse_batch_arguments(parser, args)
 
-    if len(args) < 2:
-        print('Not enough paths provided')
-        return 1
 
-    # first path is the anchors file
-    # the remaining paths are fonts
-    anchors_file = args[0]
-    fonts  = args[1:]
+def main(args=None):
+    opts = get_options(args)
+    configure_profiling(opts)
 
-    anchors = parse_anchors_file(anchors_file)
+    with profiled('DeleteAnchors'):
+        with phase('parse'):
+            anchors = parse_anchors_file(opts.anchors_file, opts.use_cache)
 
-    for path in fonts:
-        font = Font(path)
-        delete_anchors(font, anchors)
+        checkpoint = open_checkpoint(opts, 'DeleteAnchors', opts.anchors_file)
+        results = run_batch(
+            process_font, opts.fonts, (anchors, opts), opts.jobs, checkpoint)
+    status = print_summary(results, '%d anchors deleted', opts.dry_run)
 
     print('Done!')
+    return status
 
 
 if __name__ == "__main__":
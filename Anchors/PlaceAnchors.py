@@ -3,13 +3,36 @@ Takes in an anchors-like file plus one (or more) UFOs and adds anchors to the
 glyphs. One of the big differences from "Anchors Input" is that the latter
 deletes all existing anchors before adding. The other difference is that X and Y
 values are optional.
+
+X and Y values may be arithmetic expressions made of numbers, + - * /,
+parentheses and the font metrics ascender, capHeight, descender, unitsPerEm
+and xHeight (e.g. 'xHeight+20'). Expressions that use metrics are evaluated
+with each font's values.
 """
 from __future__ import print_function, division
 
+import argparse
 import os
 import sys
 
-from defcon import Font, Anchor
+from defcon import Anchor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.anchors_cache import cached_parse
+from shared.anchors_file import build_index, read_records
+from shared.batch import add_batch_arguments, open_checkpoint, parse_batch_arguments, print_summary, run_batch
+from shared.bounds_cache import BoundsCache
+from shared.expressions import compile_expression, font_metrics
+from shared.font_access import FontGlyphs, open_ufo
+from shared.glif_anchors import CannotPatch, GlifAnchor, patch_font_anchors
+from shared.profiling import configure_profiling, count, phase, profiled
+from shared.ufo_save import save_glyphs
 
 
 POS_KEYWORDS = [
@@ -24,11 +47,60 @@ POS_KEYWORDS = [
 'BOT_RIGHT',
 ]
 
-def readFile(filePath):
-    file = open(filePath, 'r')
-    fileContent = file.read().splitlines()
-    file.close()
-    return fileContent
+def get_keyword_pos(bounds, keyword):
+    """bounds is a tuple in the form (xMin, yMin, xMax, yMax).
+       Returns the position named by keyword (one of POS_KEYWORDS),
+       without calculating the others."""
+    xMin, yMin, xMax, yMax = (int(i) for i in bounds)
+    vertical, horizontal = keyword.split('_')
+
+    if horizontal == 'LEFT':
+        x = xMin
+    elif horizontal == 'RIGHT':
+        x = xMax
+    else:
+        x = int((xMax+xMin)/2)
+
+    if vertical == 'TOP':
+        y = yMax
+    elif vertical == 'BOT':
+        y = yMin
+    else:
+        y = int((yMax+yMin)/2)
+
+    return x, y
+
+
+# column indices of the horizontal and vertical parts of each keyword, in the
+# (LEFT, CENTER, RIGHT) and (BOT, MID, TOP) tables of get_keyword_positions
+_KEYWORD_COLUMNS = dict(
+    (keyword, (['LEFT', 'CENTER', 'RIGHT'].index(keyword.split('_')[1]),
+               ['BOT', 'MID', 'TOP'].index(keyword.split('_')[0])))
+    for keyword in POS_KEYWORDS)
+
+
+def get_keyword_positions(bounds_list, keywords):
+    """bounds_list is a list of (xMin, yMin, xMax, yMax) tuples, and
+       keywords a list of the same length of POS_KEYWORDS. Returns the list
+       of the positions named by the keywords, calculated for all the bounds
+       at once when NumPy is available. The values are the same as those of
+       get_keyword_pos()."""
+    if numpy is None or not bounds_list:
+        return [get_keyword_pos(bounds, keyword)
+                for bounds, keyword in zip(bounds_list, keywords)]
+
+    # numpy.trunc() rounds like int(), and the sums of the truncated
+    # values are exact, so the centers match int((xMax+xMin)/2)
+    xMin, yMin, xMax, yMax = numpy.trunc(
+        numpy.array(bounds_list, dtype=numpy.float64)).T
+    x_table = numpy.stack([xMin, numpy.trunc((xMax+xMin)/2), xMax], axis=1)
+    y_table = numpy.stack([yMin, numpy.trunc((yMax+yMin)/2), yMax], axis=1)
+
+    columns = numpy.array([_KEYWORD_COLUMNS[keyword] for keyword in keywords])
+    rows = numpy.arange(len(keywords))
+    x = x_table[rows, columns[:, 0]].astype(numpy.int64).tolist()
+    y = y_table[rows, columns[:, 1]].astype(numpy.int64).tolist()
+    return list(zip(x, y))
 
 
 def get_glyph_pos(bounds):
@@ -36,120 +108,275 @@ def get_glyph_pos(bounds):
        This function calculates a few important positions
        defined by the glyph's outlines, and returns them
        as a dict of keywords."""
-    xMin, yMin, xMax, yMax = (int(i) for i in bounds)
-    xCen = int((xMax+xMin)/2)
-    yMid = int((yMax+yMin)/2)
+    return dict((keyword, get_keyword_pos(bounds, keyword))
+                for keyword in POS_KEYWORDS)
 
-    glyph_pos = {}
-    glyph_pos['TOP_LEFT']   = (xMin, yMax)
-    glyph_pos['TOP_CENTER'] = (xCen, yMax)
-    glyph_pos['TOP_RIGHT']  = (xMax, yMax)
-    glyph_pos['MID_LEFT']   = (xMin, yMid)
-    glyph_pos['MID_CENTER'] = (xCen, yMid)
-    glyph_pos['MID_RIGHT']  = (xMax, yMid)
-    glyph_pos['BOT_LEFT']   = (xMin, yMin)
-    glyph_pos['BOT_CENTER'] = (xCen, yMin)
-    glyph_pos['BOT_RIGHT']  = (xMax, yMin)
 
-    return glyph_pos
+def evaluate_position(anchor_pos, metrics):
+    """anchor_pos is an (X, Y) tuple whose values are ints or Expression
+       objects. Returns the position as a tuple of ints, evaluating the
+       expressions with the font metrics in the metrics dict."""
+    return tuple(value if isinstance(value, int) else int(value.evaluate(metrics))
+                 for value in anchor_pos)
 
 
-def place_anchors(font, anchors):
+def place_anchors(font, anchors, dry_run=False, use_cache=True, errors=None,
+                  bounds_cache=None):
     """anchors is a dict in the form
        {'glyph_name': {'anchor_name1': 'BOT_LEFT',
-                       'anchor_name2': (320, -20)}}"""
+                       'anchor_name2': (320, -20),
+                       'anchor_name3': (250, Expression('xHeight+20'))}}
+       Writes the glyphs that were modified back to the UFO (unless dry_run
+       is True), and returns the count of anchors placed, the list of the
+       names of the modified glyphs and the list of the glyph names that
+       aren't in the font. The bounds needed by keyword positions
+       are kept in a cache next to the UFO, unless use_cache is False;
+       the cache is only written when the glyphs are. A caller that writes
+       the glyphs itself can pass its own BoundsCache, and save it after.
+       The error messages of the anchors that can't be placed are
+       appended to the errors list if one is given, and printed
+       otherwise."""
 
     placed_count = 0
-
-    for gname, anchor_names in anchors.items():
-        if gname not in font.keys():
-            continue
-        glyph = font[gname]
-        glyph_pos = get_glyph_pos(glyph.bounds)
-        glyph_anchors = [anchor.name for anchor in glyph.anchors]
-
-        for anchor_name, anchor_pos in anchor_names.items():
-            if isinstance(anchor_pos, tuple):
-                pass
-            else:
-                anchor_pos = glyph_pos[anchor_pos]
-
+    modified_glyphs = set()
+    glyphs = FontGlyphs(font)
+    save_bounds = bounds_cache is None and use_cache and not dry_run
+    if bounds_cache is None and use_cache:
+        bounds_cache = BoundsCache(font)
+    metrics = None
+
+    with phase('apply'):
+        # [glyph, anchor_name, anchor_pos] lists, in the order of the file
+        placements = []
+        # the placements that use a keyword, and the bounds of their glyphs
+        keyword_placements = []
+        keyword_bounds = []
+
+        for gname in glyphs.resolve(anchors):
+            anchor_names = anchors[gname]
+            glyph = glyphs[gname]
+            glyph_anchors = [anchor.name for anchor in glyph.anchors]
+            bounds = None
+
+            for anchor_name, anchor_pos in anchor_names.items():
+                if anchor_name in glyph_anchors:
+                    continue
+
+                if isinstance(anchor_pos, tuple):
+                    if not all(isinstance(value, int) for value in anchor_pos):
+                        if metrics is None:
+                            metrics = font_metrics(font)
+                        try:
+                            anchor_pos = evaluate_position(anchor_pos, metrics)
+                        except ValueError as error:
+                            _report_error(
+                                errors, "Can't place anchor %s of glyph %s: "
+                                "%s" % (anchor_name, gname, error))
+                            continue
+                else:
+                    # the bounds are only needed for keyword positions
+                    if bounds is None:
+                        if bounds_cache is not None:
+                            bounds = bounds_cache.bounds(glyph)
+                        else:
+                            bounds = glyph.bounds
+                    if bounds is None:
+                        _report_error(
+                            errors, "Glyph %s has no outlines to place "
+                            "anchor %s at %s" % (gname, anchor_name, anchor_pos))
+                        continue
+                    keyword_placements.append(len(placements))
+                    keyword_bounds.append(bounds)
+
+                placements.append([glyph, anchor_name, anchor_pos])
+
+        # calculate the keyword positions of all the glyphs at once
+        keyword_positions = get_keyword_positions(
+            keyword_bounds,
+            [placements[index][2] for index in keyword_placements])
+        for index, anchor_pos in zip(keyword_placements, keyword_positions):
+            placements[index][2] = anchor_pos
+
+        for glyph, anchor_name, anchor_pos in placements:
             anchor = Anchor()
             anchor.name = anchor_name
             anchor.x, anchor.y = anchor_pos
 
-            if anchor_name not in glyph_anchors:
-                glyph.appendAnchor(anchor)
-                placed_count += 1
+            glyph.appendAnchor(anchor)
+            placed_count += 1
+            modified_glyphs.add(glyph.name)
+
+    count('glyphs_touched', len(modified_glyphs))
+
+    written = save_glyphs(font, modified_glyphs, dry_run=dry_run)
+    if save_bounds:
+        bounds_cache.save()
+    return placed_count, written, glyphs.missing
+
+
+def _report_error(errors, message):
+    if errors is None:
+        print("ERROR: %s. Skipped." % message)
+    else:
+        errors.append(message)
+
+
+def place_glif_anchors(glif_anchors, anchor_names):
+    """Adds the anchors in anchor_names that a .glif file (see
+       shared.glif_anchors) doesn't have yet, and returns their count.
+       Raises CannotPatch if any of them needs the glyph's outlines or the
+       font's metrics."""
+    glyph_anchors = set(anchor.name for anchor in glif_anchors)
+    new_anchors = [(anchor_name, anchor_pos)
+                   for anchor_name, anchor_pos in anchor_names.items()
+                   if anchor_name not in glyph_anchors]
+
+    for anchor_name, anchor_pos in new_anchors:
+        if not (isinstance(anchor_pos, tuple) and
+                all(isinstance(value, int) for value in anchor_pos)):
+            raise CannotPatch('position of anchor %s' % anchor_name)
+
+    for anchor_name, (x, y) in new_anchors:
+        glif_anchors.append(GlifAnchor(anchor_name, x, y))
+    return len(new_anchors)
+
+
+def process_font(path, job):
+    """Returns the tuple of place_anchors(), plus the list of the errors,
+       which print_summary() reports under the font."""
+    anchors, opts = job
+    errors = []
+    with profiled('PlaceAnchors', path):
+        if opts.direct:
+            result = patch_font_anchors(
+                path, anchors, place_glif_anchors,
+                lambda font, anchors, dry_run: place_anchors(
+                    font, anchors, dry_run, opts.use_cache, errors),
+                opts.dry_run, opts.lazy)
+        else:
+            with phase('load'):
+                font = open_ufo(path, opts.lazy)
+            result = place_anchors(
+                font, anchors, opts.dry_run, opts.use_cache, errors)
+    return tuple(result) + (errors,)
+
+
+def parse_coordinate(text):
+    """Returns the int value of a coordinate column, or an Expression if
+       the value depends on the font's metrics. Raises ValueError if the
+       column isn't a valid expression."""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    expression = compile_expression(text)
+    if expression.names:
+        return expression
+    return int(expression.evaluate())
+
+
+def parse_anchors_file(file_path, use_cache=True):
+    """Returns the anchors dict of the file, from its sidecar cache if
+       possible (and use_cache is True)."""
+    if use_cache:
+        return cached_parse(file_path, 'place', _parse_anchors_file,
+                            _encode_anchors, _decode_anchors)
+    return _parse_anchors_file(file_path)
+
+
+def _parse_anchors_file(file_path):
+    index = build_index(read_records(file_path, min_columns=2))
+    anchors_dict = {}
 
-    if placed_count:
-        font.save()
-        print(os.path.basename(font.path))
-        print('  %d anchors placed' % placed_count)
+    for glyph_name, records in index.items():
+        glyph_anchors = {}
+        for record in records:
+            anchor_name = record.anchor_name
+            anchor_pos = record.values
+
+            if len(anchor_pos) == 0:
+                # the position was left blank; use X=Y=0
+                anchor_pos = tuple([0,0])
+            elif len(anchor_pos) == 1 and anchor_pos[0] in POS_KEYWORDS:
+                # the position is defined by a keyword string
+                anchor_pos = anchor_pos[0]
+            elif len(anchor_pos) == 2:
+                # the position is defined by X and Y values, which may be
+                # expressions; those that use font metrics are evaluated
+                # later, for each font
+                try:
+                    anchor_pos = tuple(parse_coordinate(pos) for pos in anchor_pos)
+                except ValueError as error:
+                    print("ERROR: Invalid position at line #%d: %s. Skipped." % (record.line_number, error))
+                    continue
+            else:
+                print("WARNING: Not sure how to parse line #%d. Skipped." % record.line_number)
+                continue
 
+            if anchor_name in glyph_anchors:
+                print("ERROR: Duplicate anchor entry found at line #%d. Skipped." % record.line_number)
+            else:
+                glyph_anchors[anchor_name] = anchor_pos
 
-def parse_anchors_file(file_path):
-    anchors_data = readFile(file_path)
-    anchors_dict = {}
+        if glyph_anchors:
+            anchors_dict[glyph_name] = glyph_anchors
 
-    for index, line in enumerate(anchors_data):
-        stripped_line = line.strip()
-        # skip comments and blank lines
-        if (not stripped_line) or (stripped_line.startswith('#')):
-            continue
-
-        anchor_info = stripped_line.split('\t')
-        if len(anchor_info) < 2:
-            print("ERROR: Line #%d doesn't have at least 2 columns. Skipped." % (index +1))
-            continue
-
-        glyph_name, anchor_name = anchor_info[:2]
-        anchor_pos = anchor_info[2:]
-
-        if len(anchor_pos) == 0:
-            # the position was left blank; use X=Y=0
-            anchor_pos = tuple([0,0])
-        elif len(anchor_pos) == 1 and anchor_pos[0] in POS_KEYWORDS:
-            # the position is defined by a keyword string
-            anchor_pos = anchor_pos[0]
-        elif len(anchor_pos) == 2:
-            # the position is defined by X and Y values
-            anchor_pos = tuple([int(eval(pos)) for pos in anchor_pos[:2]])
-        else:
-            print("WARNING: Not sure how to parse line #%d. Skipped." % (index +1))
-            continue
+    return anchors_dict
 
-        if glyph_name not in anchors_dict:
-            anchors_dict[glyph_name] = {anchor_name: anchor_pos}
-        else:
-            if anchor_name in anchors_dict[glyph_name]:
-                print("ERROR: Duplicate anchor entry found at line #%d. Skipped." % (index +1))
-            else:
-                anchors_dict[glyph_name].update({anchor_name: anchor_pos})
 
+def _encode_anchors(anchors_dict):
+    """Returns the anchors dict in a form marshal can store: the
+       Expressions are replaced by their text, and listed separately as
+       (glyph name, anchor name, index of the coordinate)."""
+    encoded = {}
+    expressions = []
+    for glyph_name, glyph_anchors in anchors_dict.items():
+        encoded_anchors = encoded[glyph_name] = {}
+        for anchor_name, anchor_pos in glyph_anchors.items():
+            if isinstance(anchor_pos, tuple):
+                for i, value in enumerate(anchor_pos):
+                    if not isinstance(value, int):
+                        expressions.append((glyph_name, anchor_name, i))
+                anchor_pos = tuple(value if isinstance(value, int) else value.text
+                                   for value in anchor_pos)
+            encoded_anchors[anchor_name] = anchor_pos
+    return encoded, expressions
+
+
+def _decode_anchors(data):
+    anchors_dict, expressions = data
+    for glyph_name, anchor_name, i in expressions:
+        glyph_anchors = anchors_dict[glyph_name]
+        anchor_pos = list(glyph_anchors[anchor_name])
+        anchor_pos[i] = compile_expression(anchor_pos[i])
+        glyph_anchors[anchor_name] = tuple(anchor_pos)
     return anchors_dict
 
 
-def main(args=None):
-    if args is None:
-        args = sys.argv[1:]
+def get_options(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('anchors_file', help='path to the anchors file')
+    parser.add_argument('fonts', nargs='*', metavar='font',
+                        help='path to a UFO font')
+    add_batch_arguments(parser)
+    return parse_batch_arguments(parser, args)
 
-    if len(args) < 2:
-        print('Not enough paths provided')
-        return 1
 
-    # first path is the anchors file
-    # the remaining paths are fonts
-    anchors_file = args[0]
-    fonts  = args[1:]
+def main(args=None):
+    opts = get_options(args)
+    configure_profiling(opts)
 
-    anchors = parse_anchors_file(anchors_file)
+    with profiled('PlaceAnchors'):
+        with phase('parse'):
+            anchors = parse_anchors_file(opts.anchors_file, opts.use_cache)
 
-    for path in fonts:
-        font = Font(path)
-        place_anchors(font, anchors)
+        checkpoint = open_checkpoint(opts, 'PlaceAnchors', opts.anchors_file)
+        results = run_batch(
+            process_font, opts.fonts, (anchors, opts), opts.jobs, checkpoint)
+    status = print_summary(results, '%d anchors placed', opts.dry_run)
 
     print('Done!')
+    return status
 
 
 if __name__ == "__main__":
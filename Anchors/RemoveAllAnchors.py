@@ -1,3 +1,4 @@
+from __future__ import print_function
 __copyright__ = __license__ =  """
 Copyright (c) 2013 Adobe Systems Incorporated. All rights reserved.
 
@@ -21,36 +22,72 @@ DEALINGS IN THE SOFTWARE.
 """
 
 __doc__ = """
-Remove All Anchors v1.0 - Feb 21 2013
+Remove All Anchors v1.1 - Oct 18 2026
 
 Removes all the anchors in a font.
 
 ==================================================
 Versions:
+v1.1 - Oct 18 2026 - Updates each glyph once, holding its notifications while it's edited;
+                     can be run outside of RoboFont
 v1.0 - Feb 21 2013 - Initial release
 """
 
+import os
+import sys
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.notifications import GlyphChangeBatch
+from shared.profiling import configure_profiling, count, phase, profiled
+
+
 def run(font):
 	anchorFound = False
 
-	for glyph in font:
-		if len(glyph.anchors) > 0:
-			glyph.clearAnchors()
-			glyph.glyphChangedUpdate()
-			anchorFound = True
+	with phase('apply'), GlyphChangeBatch() as batch:
+		for glyph in font:
+			if len(glyph.anchors) > 0:
+				batch.will_change(glyph)
+				glyph.clearAnchors()
+				anchorFound = True
+	count('glyphs_touched', len(batch))
 
 	if anchorFound:
-		print 'All anchors were removed.'
+		print('All anchors were removed.')
 	else:
-		print 'The font had no anchors.'
+		print('The font had no anchors.')
+	return anchorFound
+
+
+def main(args=None):
+	"""Headless entry point; removes the anchors of each font and saves it."""
+	parser = font_arguments_parser(__doc__)
+	options = parser.parse_args(args)
+	configure_profiling(options)
+
+	for fontPath in options.fonts:
+		print(os.path.basename(os.path.normpath(fontPath)))
+		with profiled('RemoveAllAnchors', fontPath):
+			with phase('load'):
+				font = open_font(fontPath)
+			if run(font):
+				with phase('save'):
+					font.save()
+	return 0
 
 
 if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
+
 	font = CurrentFont()
 	if font == None:
-		print 'Open a font first.'
+		print('Open a font first.')
 	else:
 		if not len(font):
-			print "The font has no glyphs."
+			print("The font has no glyphs.")
 		else:
-			run(font)
+			with profiled('RemoveAllAnchors', font.path):
+				run(font)
@@ -7,89 +7,120 @@ glyph_name<tab>current_anchor_name<tab>new_anchor_name
 """
 from __future__ import print_function
 
+import argparse
 import os
 import sys
 
-from defcon import Font
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.anchors_cache import cached_parse
+from shared.anchors_file import build_index, read_records
+from shared.batch import add_batch_arguments, open_checkpoint, parse_batch_arguments, print_summary, run_batch
+from shared.font_access import FontGlyphs, open_ufo
+from shared.glif_anchors import patch_font_anchors
+from shared.profiling import configure_profiling, count, phase, profiled
+from shared.ufo_save import save_glyphs
 
 
-def readFile(filePath):
-    file = open(filePath, 'r')
-    fileContent = file.read().splitlines()
-    file.close()
-    return fileContent
-
-
-def rename_anchors(font, anchors):
+def rename_anchors(font, anchors, dry_run=False):
     """anchors is a dict in the form
        {'glyph_name': {'current_anchor_name1': 'new_anchor_name1',
-                       'current_anchor_name2': 'new_anchor_name2'}}"""
+                       'current_anchor_name2': 'new_anchor_name2'}}
+       Writes the glyphs that were modified back to the UFO (unless dry_run
+       is True), and returns the count of anchors renamed, the list of the
+       names of the modified glyphs and the list of the glyph names that
+       aren't in the font."""
 
     renamed_count = 0
-
-    for gname, anchor_names in anchors.items():
-        if gname not in font.keys():
-            continue
-        glyph = font[gname]
-        for anchor in glyph.anchors:
-            if anchor.name in anchor_names:
-                anchor.name = anchor_names[anchor.name]
-                renamed_count += 1
-
-    if renamed_count:
-        font.save()
-        print(os.path.basename(font.path))
-        print('  %d anchors renamed' % renamed_count)
-
-
-def parse_anchors_file(file_path):
-    anchors_data = readFile(file_path)
+    modified_glyphs = set()
+    glyphs = FontGlyphs(font)
+
+    with phase('apply'):
+        for gname in glyphs.resolve(anchors):
+            anchor_names = anchors[gname]
+            glyph = glyphs[gname]
+            for anchor in glyph.anchors:
+                if anchor.name in anchor_names:
+                    anchor.name = anchor_names[anchor.name]
+                    renamed_count += 1
+                    modified_glyphs.add(gname)
+    count('glyphs_touched', len(modified_glyphs))
+
+    written = save_glyphs(font, modified_glyphs, dry_run=dry_run)
+    return renamed_count, written, glyphs.missing
+
+
+def rename_glif_anchors(glif_anchors, anchor_names):
+    """Renames the anchors of a .glif file (see shared.glif_anchors)
+       that are in anchor_names, and returns their count."""
+    renamed_count = 0
+    for anchor in glif_anchors:
+        if anchor.name in anchor_names:
+            anchor.name = anchor_names[anchor.name]
+            renamed_count += 1
+    return renamed_count
+
+
+def process_font(path, job):
+    anchors, opts = job
+    with profiled('RenameAnchors', path):
+        if opts.direct:
+            return patch_font_anchors(
+                path, anchors, rename_glif_anchors, rename_anchors,
+                opts.dry_run, opts.lazy)
+        with phase('load'):
+            font = open_ufo(path, opts.lazy)
+        return rename_anchors(font, anchors, opts.dry_run)
+
+
+def parse_anchors_file(file_path, use_cache=True):
+    """Returns the anchors dict of the file, from its sidecar cache if
+       possible (and use_cache is True)."""
+    if use_cache:
+        return cached_parse(file_path, 'rename', _parse_anchors_file)
+    return _parse_anchors_file(file_path)
+
+
+def _parse_anchors_file(file_path):
+    index = build_index(read_records(file_path, min_columns=3))
     anchors_dict = {}
 
-    for index, line in enumerate(anchors_data):
-        stripped_line = line.strip()
-        # skip comments and blank lines
-        if (not stripped_line) or (stripped_line.startswith('#')):
-            continue
-
-        anchor_info = line.split('\t')
-        if len(anchor_info) < 3:
-            print("ERROR: Line #%d doesn't have at least 3 columns. Skipped." % (index +1))
-            continue
-
-        glyph_name, current_anchor_name, new_anchor_name = anchor_info[:3]
-
-        if glyph_name not in anchors_dict:
-            anchors_dict[glyph_name] = {current_anchor_name: new_anchor_name}
-        else:
-            if current_anchor_name in anchors_dict[glyph_name]:
-                print("ERROR: Duplicate anchor renaming entry found at line #%d. Skipped." % (index +1))
+    for glyph_name, records in index.items():
+        renaming_dict = anchors_dict[glyph_name] = {}
+        for record in records:
+            current_anchor_name = record.anchor_name
+            if current_anchor_name in renaming_dict:
+                print("ERROR: Duplicate anchor renaming entry found at line #%d. Skipped." % record.line_number)
             else:
-                anchors_dict[glyph_name].update({current_anchor_name: new_anchor_name})
+                renaming_dict[current_anchor_name] = record.values[0]
 
     return anchors_dict
 
 
-def main(args=None):
-    if args is None:
-        args = sys.argv[1:]
+def get_options(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('anchors_file', help='path to the anchors file')
+    parser.add_argument('fonts', nargs='*', metavar='font',
+                        help='path to a UFO font')
+    add_batch_arguments(parser)
+    return parse_batch_arguments(parser, args)
 
-    if len(args) < 2:
-        print('Not enough paths provided')
-        sys.exit(1)
 
-    # first path is the anchors file
-    # the remaining paths are fonts
-    anchors_file = args[0]
-    fonts  = args[1:]
+def main(args=None):
+    opts = get_options(args)
+    configure_profiling(opts)
 
-    anchors = parse_anchors_file(anchors_file)
+    with profiled('RenameAnchors'):
+        with phase('parse'):
+            anchors = parse_anchors_file(opts.anchors_file, opts.use_cache)
 
-    for path in fonts:
-        font = Font(path)
-        rename_anchors(font, anchors)
+        checkpoint = open_checkpoint(opts, 'RenameAnchors', opts.anchors_file)
+        results = run_batch(
+            process_font, opts.fonts, (anchors, opts), opts.jobs, checkpoint)
+    status = print_summary(results, '%d anchors renamed', opts.dry_run)
 
     print('Done!')
+    return status
 
 
 if __name__ == "__main__":
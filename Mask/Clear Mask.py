@@ -24,15 +24,30 @@ __doc__ = """
 
 Clears the contents of the layer named 'mask'.
 
+The glyphs to clear are found from the names of the glyphs the mask layer
+has, so the selected glyphs without a mask glyph are never loaded. When the
+whole font is selected and kDeleteLayerWhenAllSelected is True (or
+--delete-layer is given), the mask layer is deleted instead.
+
 """
 
 #----------------------------------------
 
 kMaskLayerName = 'mask'
+kDeleteLayerWhenAllSelected = False
+
+import os
+import sys
 
-from AppKit import NSApp
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.glyph_layers import get_layer_glyph
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.notifications import GlyphChangeBatch
+from shared.profiling import configure_profiling, count, phase, profiled
 
 def glyphWindowHasFocus():
+	from AppKit import NSApp
 	window = NSApp.orderedWindows()[0]
 	if hasattr(window, "windowName"):
 		if window.windowName() == "GlyphWindow":
@@ -40,18 +55,70 @@ def glyphWindowHasFocus():
 	return False
 
 
-def clearGlyphMask(g):
-	maskGlyph = g.getLayer(kMaskLayerName, clear=False)
-	if len(maskGlyph) or maskGlyph.components:
-		g.getLayer(kMaskLayerName, clear=True)
-		g.update()
+def clearGlyphMask(g, batch):
+	maskGlyph = get_layer_glyph(g, kMaskLayerName, clear=False, create=False)
+	if maskGlyph is not None and (len(maskGlyph) or maskGlyph.components):
+		get_layer_glyph(g, kMaskLayerName, clear=True)
+		batch.glyph_changed(g)
+
+
+def run(font, glyphNames, deleteLayer=kDeleteLayerWhenAllSelected):
+	"""Returns the number of glyphs that were modified. If deleteLayer is
+	True and glyphNames holds all the glyphs of the font, the mask layer
+	is deleted, and all its glyphs count as modified."""
+	with phase('apply'):
+		if kMaskLayerName not in font.layerOrder:
+			return 0
+		maskLayer = font.getLayer(kMaskLayerName)
+		maskGlyphNames = set(maskLayer.keys())
+
+		if deleteLayer and set(glyphNames) >= set(font.keys()):
+			font.removeLayer(kMaskLayerName)
+			count('glyphs_touched', len(maskGlyphNames))
+			return len(maskGlyphNames)
+
+		with GlyphChangeBatch() as batch:
+			for gName in glyphNames:
+				if gName not in maskGlyphNames:
+					continue
+				maskGlyph = maskLayer[gName]
+				if len(maskGlyph) or maskGlyph.components:
+					batch.will_change(maskGlyph)
+					maskGlyph.clear()
+	count('glyphs_touched', len(batch))
+	return len(batch)
+
+
+def main(args=None):
+	"""Headless entry point; clears the mask layer of all the glyphs
+	in each font, and saves the fonts that changed."""
+	parser = font_arguments_parser(__doc__)
+	parser.add_argument('--delete-layer', dest='deleteLayer', action='store_true',
+						help='delete the mask layer instead of clearing its glyphs')
+	options = parser.parse_args(args)
+	configure_profiling(options)
+
+	for fontPath in options.fonts:
+		with profiled('ClearMask', fontPath):
+			with phase('load'):
+				font = open_font(fontPath)
+			changedCount = run(font, font.keys(), options.deleteLayer)
+			print('%s: %d glyphs changed' % (os.path.basename(os.path.normpath(fontPath)), changedCount))
+			if changedCount:
+				with phase('save'):
+					font.save()
+	return 0
+
 
+if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
 
-if glyphWindowHasFocus():
-	g = CurrentGlyph()
-	clearGlyphMask(g)	
-else:
-	f = CurrentFont()
-	for gName in f.selection:
-		g = f[gName]
-		clearGlyphMask(g)	
+	if glyphWindowHasFocus():
+		g = CurrentGlyph()
+		with GlyphChangeBatch() as batch:
+			clearGlyphMask(g, batch)
+	else:
+		f = CurrentFont()
+		with profiled('ClearMask', f.path):
+			run(f, f.selection)
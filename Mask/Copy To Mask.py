@@ -26,15 +26,36 @@ Copies the contents of the 'foreground' layer to the layer named 'mask'.
 If a layer named 'mask' does not exist already, it will be created.
 The glyphs in the 'mask' layer will be decomposed.
 
+Composites are decomposed in bulk (see shared/decompose.py): each base
+glyph is flattened once, the first time a composite that uses it is copied,
+and the masks of the composites are built from its transformed outlines.
+The bases are always read from the foreground layer.
+
+A fingerprint of each glyph's foreground (with its components resolved) and
+of the resulting mask is kept in the mask glyph's lib. A glyph whose
+foreground and mask haven't changed since it was last copied is skipped.
+
 """
 
 #----------------------------------------
 
 kMaskLayerName = 'mask'
+kFingerprintLibKey = 'com.adobe.type.CopyToMask.fingerprint'
 
-from AppKit import NSApp
+import os
+import sys
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.decompose import Decomposer
+from shared.glyph_layers import copy_to_layer, get_layer_glyph
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.notifications import GlyphChangeBatch
+from shared.outline_fingerprint import OutlineFingerprints, points_fingerprint
+from shared.profiling import configure_profiling, count, phase, profiled
 
 def glyphWindowHasFocus():
+	from AppKit import NSApp
 	window = NSApp.orderedWindows()[0]
 	if hasattr(window, "windowName"):
 		if window.windowName() == "GlyphWindow":
@@ -42,20 +63,74 @@ def glyphWindowHasFocus():
 	return False
 
 
-def copyGlyphToMask(g):
+def maskIsCurrent(maskGlyph, foregroundFingerprint):
+	"""Returns True if the mask glyph was made from a foreground with the
+	given fingerprint, and wasn't modified since."""
+	stored = maskGlyph.lib.get(kFingerprintLibKey)
+	if not stored or stored.get('foreground') != foregroundFingerprint:
+		return False
+	return stored.get('mask') == points_fingerprint(maskGlyph)
+
+
+def copyGlyphToMask(g, batch, fingerprints, decomposer):
 	if len(g) or g.components:
-		g.copyToLayer(kMaskLayerName, clear=False)
-		maskGlyph = g.getLayer(kMaskLayerName, clear=False)
-		if maskGlyph.components:
-			maskGlyph.decompose()
-		g.update()
-
-
-if glyphWindowHasFocus():
-	g = CurrentGlyph()
-	copyGlyphToMask(g)	
-else:
-	f = CurrentFont()
-	for gName in f.selection:
-		g = f[gName]
-		copyGlyphToMask(g)	
+		foregroundFingerprint = fingerprints.glyph_fingerprint(g)
+		maskGlyph = get_layer_glyph(g, kMaskLayerName, create=False)
+		if maskGlyph is not None and maskIsCurrent(maskGlyph, foregroundFingerprint):
+			return
+		maskGlyph = copy_to_layer(g, kMaskLayerName, clear=False)
+		if g.components:
+			# replace the copied components by their decomposed outlines
+			for component in maskGlyph.components[-len(g.components):]:
+				maskGlyph.removeComponent(component)
+			decomposer.draw_components(g.name, maskGlyph.getPointPen())
+		maskGlyph.lib[kFingerprintLibKey] = {
+			'foreground': foregroundFingerprint,
+			'mask': points_fingerprint(maskGlyph),
+		}
+		batch.glyph_changed(g)
+
+
+def run(font, glyphNames):
+	"""Returns the number of glyphs that were modified."""
+	fingerprints = OutlineFingerprints()
+	with phase('apply'), GlyphChangeBatch() as batch:
+		decomposer = Decomposer(font)
+		for gName in glyphNames:
+			g = font[gName]
+			copyGlyphToMask(g, batch, fingerprints, decomposer)
+	count('glyphs_touched', len(batch))
+	return len(batch)
+
+
+def main(args=None):
+	"""Headless entry point; copies all the glyphs of each font to
+	the mask layer, and saves the fonts."""
+	parser = font_arguments_parser(__doc__)
+	options = parser.parse_args(args)
+	configure_profiling(options)
+
+	for fontPath in options.fonts:
+		with profiled('CopyToMask', fontPath):
+			with phase('load'):
+				font = open_font(fontPath)
+			changedCount = run(font, font.keys())
+			print('%s: %d glyphs changed' % (os.path.basename(os.path.normpath(fontPath)), changedCount))
+			if changedCount:
+				with phase('save'):
+					font.save()
+	return 0
+
+
+if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
+
+	if glyphWindowHasFocus():
+		g = CurrentGlyph()
+		with GlyphChangeBatch() as batch:
+			copyGlyphToMask(g, batch, OutlineFingerprints(), Decomposer(g.layer))
+	else:
+		f = CurrentFont()
+		with profiled('CopyToMask', f.path):
+			run(f, f.selection)
@@ -1,3 +1,4 @@
+from __future__ import print_function
 __copyright__ = __license__ =  """
 Copyright (c) 2013 Adobe Systems Incorporated. All rights reserved.
  
@@ -26,13 +27,53 @@ Removes the Unicode values from all of the glyphs in the font.
 
 """
 
+import os
+import sys
 
-font = CurrentFont()
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.headless import font_arguments_parser, in_robofont, open_font
+from shared.profiling import configure_profiling, count, phase, profiled
 
-for glyph in font:
-    glyph.unicode = None
 
-if len(font.getCharacterMapping().keys()):
-    print("ERROR: Some glyphs still have Unicode value.")
-else:
-    print("Done!")
+def run(font):
+    with phase('apply'):
+        touched_count = 0
+        for glyph in font:
+            if glyph.unicodes:
+                touched_count += 1
+            glyph.unicode = None
+    count('glyphs_touched', touched_count)
+
+    if len(font.getCharacterMapping().keys()):
+        print("ERROR: Some glyphs still have Unicode value.")
+    else:
+        print("Done!")
+
+
+def main(args=None):
+    """Headless entry point; removes the Unicode values of each font
+       and saves it."""
+    parser = font_arguments_parser(__doc__)
+    options = parser.parse_args(args)
+    configure_profiling(options)
+
+    for font_path in options.fonts:
+        print(os.path.basename(os.path.normpath(font_path)))
+        with profiled('RemoveUnicodes', font_path):
+            with phase('load'):
+                font = open_font(font_path)
+            run(font)
+            with phase('save'):
+                font.save()
+    return 0
+
+
+if __name__ == "__main__":
+    if not in_robofont():
+        sys.exit(main())
+
+    font = CurrentFont()
+    with profiled('RemoveUnicodes', font.path):
+        run(font)
+
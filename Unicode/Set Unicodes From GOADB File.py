@@ -1,3 +1,4 @@
+from __future__ import print_function
 __copyright__ = __license__ =  """
 Copyright (c) 2013 Adobe Systems Incorporated. All rights reserved.
 
@@ -24,62 +25,119 @@ __doc__ = """
 
 Sets the glyphs' Unicode values according to a GOADB file.
 
+A Unicode override may hold several comma-separated values (e.g.
+'uni0020,uni00A0'), including values beyond the BMP (e.g. 'u1F600'); the
+glyph is then given all of them.
+
+The GOADB is compiled once (see shared/goadb.py) and the result is cached
+next to it, so fonts sharing a GOADB don't parse it again.
+
+Outside of RoboFont, the script takes a GOADB and any number of UFOs (or
+folders of UFOs, with -r), and can process the fonts in parallel (-j). Only
+the glyphs whose Unicode values changed are written back to the UFOs.
+
 """
 
-import re
-from mojo.UI import GetFile
-from fontTools.agl import AGL2UV as standardGlyphNamesDict
-
-re_gUniName = re.compile(r'^uni[A-F0-9]{4}$')
-re_gUName = re.compile(r'^u[A-F0-9]{5}$')
-
-
-def readFile(filePath):
-	file = open(filePath, 'r')
-	fileContent = file.read().splitlines()
-	file.close()
-	return fileContent
-
-
-font = CurrentFont()
-
-path = GetFile("Open GOADB file...")
-
-if path:
-	fileContent = readFile(path)
-	unicodeMappingsDict = {} # key is friendly glyph name; value is Unicode value
-
-	# Reads the GOADB file and fills-in the dictionary
-	lineNumber = 1
-	for line in fileContent:
-		entries = line.split()
-		if len(entries) >= 2:
-			if (entries[0][0] not in ['%','#']):
-				finalGlyphName, prodGlyphName = entries[0], entries[1]
-				if len(entries) == 3:
-					uniOverride = entries[2]
-				else:
-					uniOverride = None
-
-				# the final name is uniXXXX
-				if re_gUniName.match(finalGlyphName):
-					unicodeMappingsDict[prodGlyphName] = int(finalGlyphName[-4:], 16)
-				# the final name is uXXXXX
-				elif re_gUName.match(finalGlyphName):
-					unicodeMappingsDict[prodGlyphName] = int(finalGlyphName[-5:], 16)
-				# the GOADB line has a Unicode override
-				elif uniOverride:
-					unicodeMappingsDict[prodGlyphName] = int(uniOverride[-4:], 16)
-				# the final name is standard
-				elif finalGlyphName in standardGlyphNamesDict:
-					unicodeMappingsDict[prodGlyphName] = standardGlyphNamesDict[finalGlyphName]
-		else:
-			print('Skipped line number %d: %s' % (lineNumber, line))
-		lineNumber += 1
-
-	# Assign the Unicode values
-	for glyph in font:
-		if glyph.name in unicodeMappingsDict:
-			glyph.unicode = unicodeMappingsDict[glyph.name]
+import argparse
+import os
+import sys
+
+# make the 'shared' package at the root of the repository importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batch import add_batch_arguments, open_checkpoint, parse_batch_arguments, print_summary, run_batch
+from shared.font_access import open_ufo
+from shared.goadb import read_goadb
+from shared.headless import in_robofont
+from shared.profiling import configure_profiling, count, phase, profiled
+from shared.ufo_save import save_glyphs
+
+
+def readGOADB(path, useCache=True):
+	"""Returns a dictionary whose keys are production glyph names,
+	and whose values are lists of Unicode values."""
+	return read_goadb(path, useCache).unicodes
+
+
+def assignUnicodes(font, unicodeMappingsDict):
+	"""Sets the Unicode value of the glyphs of the font that are in
+	unicodeMappingsDict, and returns the list of the names of the glyphs
+	whose Unicode values changed. Only the glyphs the GOADB maps are
+	loaded, and only those whose values differ are modified."""
+	changedGlyphs = []
+	with phase('apply'):
+		for glyphName in font.keys():
+			if glyphName in unicodeMappingsDict:
+				glyph = font[glyphName]
+				unicodes = unicodeMappingsDict[glyphName]
+				if list(glyph.unicodes) != unicodes:
+					glyph.unicodes = unicodes
+					changedGlyphs.append(glyphName)
+	count('glyphs_touched', len(changedGlyphs))
+	return changedGlyphs
+
+
+def run(font, path, useCache=True):
+	with phase('parse'):
+		unicodeMappingsDict = readGOADB(path, useCache)
+
+	assignUnicodes(font, unicodeMappingsDict)
+
+	print('Done!')
+
+
+def processFont(path, job):
+	"""Sets the Unicode values of the UFO at path, and writes the glyphs
+	whose values changed. Called by run_batch, possibly in a worker."""
+	unicodeMappingsDict, options = job
+	with profiled('SetUnicodesFromGOADBFile', path):
+		with phase('load'):
+			font = open_ufo(path, options.lazy)
+		changedGlyphs = assignUnicodes(font, unicodeMappingsDict)
+		written = save_glyphs(font, changedGlyphs, dry_run=options.dry_run)
+	return len(changedGlyphs), written
+
+
+def main(args=None):
+	"""Headless entry point; sets the Unicode values of each font
+	and writes the glyphs that changed."""
+	parser = argparse.ArgumentParser(
+		description=__doc__,
+		formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('goadb', help='path to the GOADB file')
+	parser.add_argument('fonts', nargs='*', metavar='font',
+						help='path to a UFO font')
+	add_batch_arguments(
+		parser, cache_help="don't read or write the GOADB's compiled cache",
+		direct=False)
+	options = parse_batch_arguments(parser, args)
+	configure_profiling(options)
+
+	with profiled('SetUnicodesFromGOADBFile'):
+		with phase('parse'):
+			unicodeMappingsDict = readGOADB(options.goadb, options.use_cache)
+
+		checkpoint = open_checkpoint(
+			options, 'SetUnicodesFromGOADBFile', options.goadb)
+		results = run_batch(
+			processFont, options.fonts, (unicodeMappingsDict, options),
+			options.jobs, checkpoint)
+	status = print_summary(
+		results, '%d glyphs had their Unicode values changed', options.dry_run)
 
 	print('Done!')
+	return status
+
+
+if __name__ == "__main__":
+	if not in_robofont():
+		sys.exit(main())
+
+	from mojo.UI import GetFile
+
+	font = CurrentFont()
+
+	path = GetFile("Open GOADB file...")
+
+	if path:
+		with profiled('SetUnicodesFromGOADBFile', font.path):
+			run(font, path)
@@ -0,0 +1,253 @@
+"""
+Benchmarks for the defcon anchor tools (PlaceAnchors, DeleteAnchors and
+RenameAnchors).
+
+Synthetic UFOs of a few sizes (1k, 10k and 50k glyphs by default, each glyph
+having 0 to 8 anchors, some glyphs being composites) and matching anchors
+files are generated in a work folder. For each size and each tool, the time
+taken to parse the anchors file, load the font, apply the edit and save the
+modified glyphs is measured separately. Loading the font includes reading
+the glyphs named in the anchors file, which defcon would otherwise only do
+when the edit first touches them (the bases of composites, needed for the
+bounds of keyword positions, are still read while applying PlaceAnchors).
+The results are written as JSON, so that runs can be compared over time.
+
+Only defcon (and the fontTools it depends on) is needed. Example:
+
+    python benchmarks/bench_anchors.py --sizes 1000 10000 -o results.json
+"""
+from __future__ import print_function, division
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from fontTools.ufoLib import UFOWriter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'Anchors'))
+sys.path.insert(0, REPO_ROOT)
+
+import defcon  # noqa: E402
+import DeleteAnchors  # noqa: E402
+import PlaceAnchors  # noqa: E402
+import RenameAnchors  # noqa: E402
+from shared.ufo_save import save_glyphs  # noqa: E402
+
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+ANCHOR_NAMES = ['top', 'bottom', 'center', 'ogonek',
+                'top_dd', 'bottom_dd', 'caret_1', 'caret_2']
+TOOLS = [
+    ('place', PlaceAnchors.parse_anchors_file, PlaceAnchors.place_anchors),
+    ('delete', DeleteAnchors.parse_anchors_file, DeleteAnchors.delete_anchors),
+    ('rename', RenameAnchors.parse_anchors_file, RenameAnchors.rename_anchors),
+]
+
+
+class SyntheticGlyph(object):
+    """The minimum needed by GlyphSet.writeGlyph()."""
+
+    def __init__(self, rng, index, glyph_names):
+        self.width = 600
+        self.unicodes = []
+        self.anchors = [
+            {'name': name, 'x': rng.randint(0, 600), 'y': rng.randint(-200, 800)}
+            for name in rng.sample(ANCHOR_NAMES, rng.randint(0, 8))]
+        # one glyph in ten is a composite of two earlier glyphs
+        if index >= 2 and index % 10 == 0:
+            self.components = rng.sample(glyph_names[:index], 2)
+            self.box = None
+        else:
+            self.components = []
+            x_min, y_min = rng.randint(0, 100), rng.randint(-200, 0)
+            self.box = (x_min, y_min,
+                        x_min + rng.randint(100, 500),
+                        y_min + rng.randint(300, 1000))
+
+    def drawPoints(self, pen):
+        if self.box is not None:
+            x_min, y_min, x_max, y_max = self.box
+            pen.beginPath()
+            for point in ((x_min, y_min), (x_min, y_max),
+                          (x_max, y_max), (x_max, y_min)):
+                pen.addPoint(point, segmentType='line')
+            pen.endPath()
+        for offset, base_glyph in enumerate(self.components):
+            pen.addComponent(base_glyph, (1, 0, 0, 1, 0, offset * 600))
+
+
+def make_ufo(path, glyph_count, seed):
+    """Writes a UFO with glyph_count glyphs, and returns a dict mapping
+       each glyph name to the names of its anchors."""
+    rng = random.Random(seed)
+    glyph_names = ['glyph%05d' % i for i in range(glyph_count)]
+    glyph_anchors = {}
+
+    writer = UFOWriter(path)
+    glyph_set = writer.getGlyphSet()
+    for index, glyph_name in enumerate(glyph_names):
+        glyph = SyntheticGlyph(rng, index, glyph_names)
+        glyph_set.writeGlyph(glyph_name, glyph, glyph.drawPoints)
+        glyph_anchors[glyph_name] = [anchor['name'] for anchor in glyph.anchors]
+    glyph_set.writeContents()
+    writer.writeLayerContents()
+    writer.writeLib({'public.glyphOrder': glyph_names})
+    writer.close()
+    return glyph_anchors
+
+
+def make_anchors_files(folder, glyph_anchors, seed):
+    """Writes an anchors file for each tool, touching about a quarter of
+       the glyphs. Returns a dict mapping tool names to file paths."""
+    rng = random.Random(seed)
+    keywords = PlaceAnchors.POS_KEYWORDS
+    lines = {'place': [], 'delete': [], 'rename': []}
+
+    for glyph_name, anchor_names in glyph_anchors.items():
+        if rng.random() >= 0.25:
+            continue
+        missing = [name for name in ANCHOR_NAMES if name not in anchor_names]
+        for anchor_name in missing[:2]:
+            if rng.random() < 0.5:
+                position = rng.choice(keywords)
+            else:
+                position = '%d\t%d' % (rng.randint(0, 600), rng.randint(-200, 800))
+            lines['place'].append('%s\t%s\t%s' % (glyph_name, anchor_name, position))
+        for anchor_name in anchor_names[:2]:
+            lines['delete'].append('%s\t%s' % (glyph_name, anchor_name))
+            lines['rename'].append(
+                '%s\t%s\t%s_new' % (glyph_name, anchor_name, anchor_name))
+
+    paths = {}
+    for tool_name, tool_lines in lines.items():
+        paths[tool_name] = os.path.join(folder, 'anchors_%s.txt' % tool_name)
+        with open(paths[tool_name], 'w') as anchors_file:
+            anchors_file.write('# synthetic %s file\n' % tool_name)
+            anchors_file.write('\n'.join(tool_lines))
+            anchors_file.write('\n')
+    return paths
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def load_font(font_path, glyph_names):
+    """Opens the font and reads the glyphs named in glyph_names. defcon
+       reads the .glif files lazily; without this, their parsing would be
+       timed as part of the apply phase."""
+    font = defcon.Font(font_path)
+    for glyph_name in glyph_names:
+        if glyph_name in font:
+            font[glyph_name]
+    return font
+
+
+def bench_size(work_folder, glyph_count, seed):
+    size_folder = os.path.join(work_folder, '%d' % glyph_count)
+    os.makedirs(size_folder)
+    source_path = os.path.join(size_folder, 'source.ufo')
+
+    glyph_anchors, generate_time = timed(make_ufo, source_path, glyph_count, seed)
+    anchors_files = make_anchors_files(size_folder, glyph_anchors, seed)
+    print('%d glyphs: UFO generated in %.2fs' % (glyph_count, generate_time))
+
+    results = []
+    for tool_name, parse_func, apply_func in TOOLS:
+        font_path = os.path.join(size_folder, '%s.ufo' % tool_name)
+        shutil.copytree(source_path, font_path)
+
+        anchors, parse_time = timed(
+            parse_func, anchors_files[tool_name], use_cache=False)
+        # the first cached parse writes the cache; the second one reads it
+        parse_func(anchors_files[tool_name], use_cache=True)
+        _, cached_parse_time = timed(
+            parse_func, anchors_files[tool_name], use_cache=True)
+        font, load_time = timed(load_font, font_path, anchors)
+        (count, glyph_names, _), apply_time = timed(
+            apply_func, font, anchors, dry_run=True)
+        _, save_time = timed(save_glyphs, font, glyph_names)
+
+        result = {
+            'tool': tool_name,
+            'glyphs': glyph_count,
+            'file_lines': sum(len(names) for names in anchors.values()),
+            'anchors_changed': count,
+            'glyphs_written': len(glyph_names),
+            'parse_s': round(parse_time, 4),
+            'parse_cached_s': round(cached_parse_time, 4),
+            'load_s': round(load_time, 4),
+            'apply_s': round(apply_time, 4),
+            'save_s': round(save_time, 4),
+        }
+        print('  %-6s parse %.3fs (cached %.3fs)  load %.3fs  '
+              'apply %.3fs  save %.3fs' % (
+                  tool_name, parse_time, cached_parse_time, load_time,
+                  apply_time, save_time))
+        results.append(result)
+    return results
+
+
+def get_options(args):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        metavar='N', help='numbers of glyphs of the test fonts '
+                        '(default: %s)' % ' '.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('-o', '--output', metavar='PATH',
+                        help='JSON file to write the results to '
+                             '(default: standard output)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='seed of the random data (default: 1)')
+    parser.add_argument('--keep', metavar='FOLDER',
+                        help='generate the fonts in FOLDER and keep them, '
+                             'instead of using a temporary folder')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    opts = get_options(args)
+
+    if opts.keep:
+        work_folder = opts.keep
+        os.makedirs(work_folder)
+    else:
+        work_folder = tempfile.mkdtemp(prefix='bench_anchors_')
+
+    try:
+        results = []
+        for glyph_count in opts.sizes:
+            results.extend(bench_size(work_folder, glyph_count, opts.seed))
+    finally:
+        if not opts.keep:
+            shutil.rmtree(work_folder)
+
+    report = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'defcon': defcon.__version__,
+        'seed': opts.seed,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if opts.output:
+        with open(opts.output, 'w') as output_file:
+            output_file.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+Modules shared by the scripts in this repository.
+
+The scripts live in folders that RoboFont lists in its Scripts menu, so they
+cannot import each other as a package. A script that needs something from here
+adds the repository root to sys.path before importing from 'shared'.
+"""
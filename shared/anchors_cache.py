@@ -0,0 +1,208 @@
+"""
+Sidecar cache of parsed anchors files.
+
+Each tool turns the text of an anchors file into the data it works with
+(e.g. the dict of anchor positions of each glyph for PlaceAnchors), which
+means splitting every line, checking it, and creating a Python object per
+value. cached_parse() stores that finished data next to the anchors file,
+written with marshal, in a hidden file named '.<file name>.<kind>.anchorscache'
+(one per tool, since they don't read the same columns). Loading it is about
+fifteen times faster than parsing the file again, which matters when the
+same anchors file is applied to many masters. The messages printed while
+parsing (e.g. about invalid lines) are stored too, and printed again when
+the sidecar is loaded. GOADB files are cached the same way (see shared.goadb).
+
+A sidecar is used when the size and modification time of the anchors file
+match those recorded in it. If only the modification time differs, the SHA-1
+of the file's content decides. Otherwise the sidecar is rebuilt.
+
+Each time a sidecar is written, the other sidecars in the same folder are
+pruned: those whose anchors file is gone, those not used for MAX_AGE_DAYS,
+and the least recently used ones beyond MAX_SIDECARS.
+"""
+from __future__ import print_function
+
+import contextlib
+import hashlib
+import io
+import marshal
+import os
+import sys
+import tempfile
+import time
+
+
+CACHE_SUFFIX = '.anchorscache'
+MAX_SIDECARS = 16
+MAX_AGE_DAYS = 30
+
+# marshal's format may change with the version of Python
+_VERSION = (2, marshal.version)
+
+
+def sidecar_path(file_path, kind):
+    folder, file_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(folder, '.%s.%s%s' % (file_name, kind, CACHE_SUFFIX))
+
+
+def _source_name(sidecar_name):
+    """Returns the name of the anchors file of a sidecar, or None if the
+       name isn't that of a sidecar."""
+    if not (sidecar_name.startswith('.') and
+            sidecar_name.endswith(CACHE_SUFFIX)):
+        return None
+    name = sidecar_name[1:-len(CACHE_SUFFIX)]
+    if '.' not in name:
+        return None
+    return name.rsplit('.', 1)[0]
+
+
+def _new_file_mode():
+    """The mode open() gives new files: 0666 less the process's umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_atomically(path, data):
+    """Replaces the file at path by one holding data, so that readers see
+       either the old or the new content. The file keeps its mode; a new
+       file gets the same mode as if open() had created it."""
+    folder = os.path.dirname(path)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = _new_file_mode()
+    # mkstemp() creates the file readable by its owner only
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def prune_sidecars(folder, keep=None):
+    """Deletes the stale sidecars in folder (see the module docstring).
+       The sidecar at path 'keep' is never deleted."""
+    try:
+        file_names = os.listdir(folder)
+    except OSError:
+        return
+
+    now = time.time()
+    in_use = []
+    for file_name in file_names:
+        if not (file_name.startswith('.') and
+                file_name.endswith(CACHE_SUFFIX)):
+            continue
+        path = os.path.join(folder, file_name)
+        if path == keep:
+            continue
+        source_name = _source_name(file_name)
+        try:
+            last_used = os.path.getmtime(path)
+            if (source_name is None or
+                    not os.path.isfile(os.path.join(folder, source_name)) or
+                    now - last_used > MAX_AGE_DAYS * 86400):
+                os.remove(path)
+            else:
+                in_use.append((last_used, path))
+        except OSError:
+            continue
+
+    # the sidecar being kept counts towards the limit
+    surplus = len(in_use) + (keep is not None) - MAX_SIDECARS
+    for _last_used, path in sorted(in_use)[:max(surplus, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _load_cache(path, stat, data):
+    """Returns the cache dict of the anchors file whose stat and content
+       (None if it wasn't read yet) are given, or None if the sidecar is
+       missing or stale."""
+    try:
+        with open(path, 'rb') as sidecar:
+            # marshal.load() reads the file in small pieces; this is faster
+            cache = marshal.loads(sidecar.read())
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != _VERSION:
+        return None
+    if cache.get('size') != stat.st_size:
+        return None
+    if cache.get('mtime_ns') != stat.st_mtime_ns:
+        if data is None or hashlib.sha1(data).hexdigest() != cache.get('sha1'):
+            return None
+    if 'result' not in cache or 'output' not in cache:
+        return None
+    return cache
+
+
+def cached_parse(file_path, kind, parse, encode=None, decode=None):
+    """Returns parse(file_path), loading it from the file's sidecar for
+       'kind' (a name, without dots, that identifies the parser) when
+       possible. Otherwise parse() is called, and a new sidecar is written.
+       The result must be made of the types marshal supports; encode()
+       and decode(), if given, convert it to and from such a form."""
+    stat = os.stat(file_path)
+    path = sidecar_path(file_path, kind)
+    cache = None
+    data = None
+
+    if os.path.isfile(path):
+        cache = _load_cache(path, stat, None)
+        if cache is None:
+            with open(file_path, 'rb') as source:
+                data = source.read()
+            cache = _load_cache(path, stat, data)
+            if cache is not None:
+                # same content, newer timestamp; record the new one
+                cache['mtime_ns'] = stat.st_mtime_ns
+                _store(path, cache)
+        else:
+            # mark the sidecar as recently used
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+    if cache is not None:
+        sys.stdout.write(cache['output'])
+        result = cache['result']
+        return decode(result) if decode is not None else result
+
+    if data is None:
+        with open(file_path, 'rb') as source:
+            data = source.read()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = parse(file_path)
+    sys.stdout.write(output.getvalue())
+
+    _store(path, {
+        'version': _VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': hashlib.sha1(data).hexdigest(),
+        'output': output.getvalue(),
+        'result': encode(result) if encode is not None else result,
+    })
+    return result
+
+
+def _store(path, cache):
+    try:
+        write_atomically(path, marshal.dumps(cache))
+    except (IOError, OSError, ValueError):
+        # the folder may be read-only, or the result can't be marshalled;
+        # the cache is just an optimization
+        return
+    prune_sidecars(os.path.dirname(path), keep=path)
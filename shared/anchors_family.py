@@ -0,0 +1,164 @@
+"""
+Family (multi-master) anchors files.
+
+A family anchors file holds the anchors of all the masters of a family in one
+table. Its first line names the masters, and each of the other lines has the
+glyph name, the anchor name and then one X/Y pair of columns per master, in
+the same order as the first line. An anchor that a master lacks has empty
+X and Y columns.
+
+#MASTERS<tab>Light.ufo<tab>Bold.ufo
+A<tab>top<tab>250<tab>700<tab>270<tab>720
+
+The masters of a family are either the sources of a .designspace file, or
+the UFOs found in a folder. The family anchors file is kept in the folder of
+the designspace file (or in the folder of UFOs), and each master is named by
+its path relative to that folder, with '/' separators (e.g. 'Light.ufo', or
+'Italic/Light.ufo' for a source in a subfolder), so that masters with the
+same file name in different folders can't be mistaken for one another.
+"""
+from __future__ import print_function
+
+import io
+import os
+
+
+MASTERS_KEYWORD = '#MASTERS'
+
+
+def find_masters(path):
+    """Returns the paths of the master UFOs of a family. 'path' is a
+       designspace file (sources in document order) or a folder (UFOs
+       sorted by file name)."""
+    if os.path.isfile(path):
+        from fontTools.designspaceLib import DesignSpaceDocument
+        document = DesignSpaceDocument.fromfile(path)
+        masters = []
+        for source in document.sources:
+            if source.path not in masters:
+                masters.append(source.path)
+        return masters
+
+    return sorted(
+        os.path.join(path, file_name) for file_name in os.listdir(path)
+        if file_name.lower().endswith('.ufo'))
+
+
+def family_folder(path):
+    """Returns the folder of a family: that of its designspace file, or
+       the folder of UFOs itself. The family anchors file is kept there."""
+    if os.path.isdir(path):
+        return path
+    return os.path.dirname(os.path.abspath(path))
+
+
+def master_name(path, folder):
+    """The name under which a master appears in a family anchors file:
+       its path relative to the family's folder."""
+    name = os.path.relpath(os.path.abspath(path), os.path.abspath(folder))
+    return name.replace(os.sep, '/')
+
+
+def master_names(paths, folder):
+    """Returns the names of the masters at paths. Raises ValueError if two
+       of them have the same name."""
+    names = [master_name(path, folder) for path in paths]
+    _check_unique(names)
+    return names
+
+
+def _check_unique(names):
+    seen = set()
+    for name in names:
+        if name in seen:
+            raise ValueError('Master %s is listed more than once.' % name)
+        seen.add(name)
+
+
+def merge_master_anchors(master_anchors):
+    """master_anchors is a list with one list per master, each holding
+       (glyph_name, anchor_name, x, y) tuples in glyph order.
+       Returns a list of (glyph_name, anchor_name, positions) rows, where
+       'positions' has one (x, y) tuple (or None) per master. The rows follow
+       the glyph order of the first master that has each glyph."""
+    master_count = len(master_anchors)
+    rows = {}
+    glyph_order = []
+    for master_index, anchors in enumerate(master_anchors):
+        for glyph_name, anchor_name, x, y in anchors:
+            glyph_rows = rows.get(glyph_name)
+            if glyph_rows is None:
+                glyph_rows = rows[glyph_name] = {}
+                glyph_order.append(glyph_name)
+            positions = glyph_rows.get(anchor_name)
+            if positions is None:
+                positions = glyph_rows[anchor_name] = [None] * master_count
+            positions[master_index] = (x, y)
+
+    return [(glyph_name, anchor_name, positions)
+            for glyph_name in glyph_order
+            for anchor_name, positions in rows[glyph_name].items()]
+
+
+def write_family_file(file_path, masters, rows):
+    """Writes rows (as returned by merge_master_anchors) to a family
+       anchors file. 'masters' is the list of master names."""
+    with io.open(file_path, 'w', encoding='utf-8') as family_file:
+        family_file.write(u'\t'.join([MASTERS_KEYWORD] + list(masters)))
+        family_file.write(u'\n')
+        for glyph_name, anchor_name, positions in rows:
+            columns = [glyph_name, anchor_name]
+            for position in positions:
+                if position is None:
+                    columns.extend([u'', u''])
+                else:
+                    columns.extend([u'%d' % position[0], u'%d' % position[1]])
+            family_file.write(u'\t'.join(columns))
+            family_file.write(u'\n')
+
+
+def read_family_file(file_path):
+    """Returns the list of master names and the list of
+       (line_number, glyph_name, anchor_name, position_columns) rows of a
+       family anchors file. position_columns holds the X/Y columns of all
+       the masters, as strings."""
+    masters = None
+    rows = []
+    with io.open(file_path, 'r', encoding='utf-8') as family_file:
+        for line_number, line in enumerate(family_file, 1):
+            # only the line's end is stripped; empty columns are meaningful
+            line = line.rstrip('\r\n')
+            if line.startswith(MASTERS_KEYWORD):
+                masters = line.split('\t')[1:]
+                _check_unique(masters)
+                continue
+            # skip comments and blank lines
+            if (not line.strip()) or (line.lstrip().startswith('#')):
+                continue
+            columns = line.split('\t')
+            if masters is None:
+                raise ValueError(
+                    'The %s line must come before line #%d of %s.' %
+                    (MASTERS_KEYWORD, line_number, file_path))
+            if len(columns) != 2 + 2 * len(masters):
+                print('ERROR: Line #%d does not have %d columns. Skipped.' %
+                      (line_number, 2 + 2 * len(masters)))
+                continue
+            rows.append((line_number, columns[0], columns[1], columns[2:]))
+
+    if masters is None:
+        raise ValueError('%s has no %s line.' % (file_path, MASTERS_KEYWORD))
+    return masters, rows
+
+
+def master_rows(rows, master_index):
+    """Yields the (line_number, glyph_name, anchor_name, x, y) entries of
+       one master, with x and y still as strings. Anchors the master
+       doesn't have are left out."""
+    x_column = 2 * master_index
+    for line_number, glyph_name, anchor_name, positions in rows:
+        x = positions[x_column]
+        y = positions[x_column + 1]
+        if x == '' and y == '':
+            continue
+        yield line_number, glyph_name, anchor_name, x, y
@@ -0,0 +1,119 @@
+"""
+Reader for anchors files: plain text files with one anchor per line and
+tab-separated columns, the first two being the glyph name and the anchor name.
+Blank lines and lines starting with '#' are ignored.
+
+The file is read lazily, one line at a time, and each valid line becomes
+an AnchorRecord. build_index() groups the records by glyph name. The tools
+keep the data they build from the records in a sidecar cache
+(see shared.anchors_cache).
+"""
+from __future__ import print_function
+
+import io
+import sys
+
+
+class AnchorRecord(object):
+    """One line of an anchors file. 'values' is a tuple with the columns
+       that follow the glyph name and the anchor name."""
+    __slots__ = ('line_number', 'glyph_name', 'anchor_name', 'values')
+
+    def __init__(self, line_number, glyph_name, anchor_name, values=()):
+        self.line_number = line_number
+        self.glyph_name = glyph_name
+        self.anchor_name = anchor_name
+        self.values = values
+
+    def __repr__(self):
+        return '<AnchorRecord #%d %s %s %r>' % (
+            self.line_number, self.glyph_name, self.anchor_name, self.values)
+
+
+class AnchorsIndex(object):
+    """The records of an anchors file grouped by glyph name.
+       Glyph names and records keep the order of the file."""
+    __slots__ = ('_glyphs', 'record_count')
+
+    def __init__(self, records=()):
+        self._glyphs = {}
+        self.record_count = 0
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        glyph_records = self._glyphs.get(record.glyph_name)
+        if glyph_records is None:
+            self._glyphs[record.glyph_name] = [record]
+        else:
+            glyph_records.append(record)
+        self.record_count += 1
+
+    def __contains__(self, glyph_name):
+        return glyph_name in self._glyphs
+
+    def __iter__(self):
+        return iter(self._glyphs)
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def glyph_names(self):
+        return list(self._glyphs)
+
+    def records(self, glyph_name):
+        """Returns the records of a glyph, or an empty list."""
+        return self._glyphs.get(glyph_name, [])
+
+    def items(self):
+        return self._glyphs.items()
+
+
+def parse_lines(lines):
+    """Yields a (line_number, columns) tuple for each line that is not
+       blank or a comment. Line numbers start at 1."""
+    for line_number, line in enumerate(lines, 1):
+        stripped_line = line.strip()
+        # skip comments and blank lines
+        if (not stripped_line) or (stripped_line.startswith('#')):
+            continue
+        yield line_number, stripped_line.split('\t')
+
+
+def read_rows(file_path):
+    """Yields the (line_number, columns) rows of an anchors file,
+       reading it lazily."""
+    with io.open(file_path, 'r', encoding='utf-8') as anchors_file:
+        for row in parse_lines(anchors_file):
+            yield row
+
+
+def read_records(file_path, min_columns=2, max_columns=None):
+    """Yields an AnchorRecord for each line of the file that has between
+       min_columns and max_columns columns (max_columns=None means no upper
+       limit). Other lines are reported and skipped."""
+    if min_columns < 2:
+        raise ValueError('An anchors file has at least 2 columns.')
+
+    if min_columns == max_columns:
+        column_error = 'ERROR: Line #%%d does not have %d columns. Skipped.'
+    else:
+        column_error = "ERROR: Line #%%d doesn't have at least %d columns. Skipped."
+    column_error = column_error % min_columns
+
+    for line_number, columns in read_rows(file_path):
+        column_count = len(columns)
+        if column_count < min_columns or (
+                max_columns is not None and column_count > max_columns):
+            print(column_error % line_number)
+            continue
+        # names repeat on many lines; interned, they're stored once in
+        # memory and in the sidecar caches
+        yield AnchorRecord(
+            line_number, sys.intern(columns[0]), sys.intern(columns[1]),
+            tuple(columns[2:]))
+
+
+def build_index(records):
+    """Returns an AnchorsIndex holding the records."""
+    return AnchorsIndex(records)
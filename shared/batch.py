@@ -0,0 +1,296 @@
+"""
+Runs a per-font function over a list of UFO paths, either one after another
+or in a pool of worker processes.
+
+The data the function needs (e.g. a parsed anchors file) is handed to each
+worker once, when the worker starts, instead of being pickled with every task.
+The largest UFOs are handed out first, one at a time, to whichever worker is
+free, so that a big font started last doesn't keep the others waiting.
+Results always come back in the same order as the paths.
+
+With --recursive, the UFOs are found under the given folders. With
+--checkpoint, the fonts processed successfully are recorded in a file as
+they finish, so that an interrupted run started again with the same options
+skips them. The file is deleted once all the fonts are done.
+"""
+from __future__ import print_function
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+
+from .profiling import add_profile_arguments
+
+
+# set in each worker process by _init_worker
+_worker_func = None
+_worker_data = None
+
+
+class FontResult(object):
+    """Outcome of running a per-font function on one UFO."""
+    __slots__ = ('path', 'value', 'error')
+
+    def __init__(self, path, value=None, error=None):
+        self.path = path
+        self.value = value
+        self.error = error
+
+
+def add_batch_arguments(parser, cache_help=None, direct=True):
+    """Adds the options understood by run_batch to an argparse parser.
+       Parse the arguments with parse_batch_arguments(). cache_help
+       replaces the anchor tools' help of --no-cache; --direct is only
+       added if direct is True."""
+    parser.add_argument(
+        '-r', '--recursive', action='append', default=[], metavar='FOLDER',
+        help='process all the UFOs found in FOLDER and its subfolders. '
+             'Can be used more than once.')
+    parser.add_argument(
+        '--checkpoint', metavar='PATH',
+        help='record the fonts that are done in PATH, and skip those '
+             'already recorded there by an interrupted run')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, metavar='N',
+        help='number of worker processes to use (default: 1). '
+             'Use 0 to use one process per CPU.')
+    parser.add_argument(
+        '-n', '--dry-run', action='store_true',
+        help='report the glyphs that would be written, '
+             'without modifying the fonts')
+    parser.add_argument(
+        '--no-cache', dest='use_cache', action='store_false',
+        help=cache_help or "don't read or write the sidecar caches (of the "
+                           "anchors file, and of the glyph bounds for "
+                           "PlaceAnchors)")
+    parser.add_argument(
+        '--lazy', action='store_true',
+        help='read and write only the glyphs the tool works on, '
+             'instead of opening the whole font')
+    if direct:
+        parser.add_argument(
+            '--direct', action='store_true',
+            help="edit the <anchor> elements in the glyphs' .glif files "
+                 'directly, leaving the rest of the files untouched')
+    add_profile_arguments(parser)
+
+
+def parse_batch_arguments(parser, args):
+    """Parses args with a parser set up by add_batch_arguments(), and adds
+       the UFOs found in the --recursive folders to the 'fonts' list."""
+    opts = parser.parse_args(args)
+    for folder in opts.recursive:
+        if not os.path.isdir(folder):
+            parser.error('%s is not a folder' % folder)
+        opts.fonts.extend(find_ufos(folder))
+    if not opts.fonts:
+        parser.error('no fonts were provided')
+    return opts
+
+
+def find_ufos(folder):
+    """Returns the sorted paths of the UFOs in folder and its subfolders.
+       Hidden folders and the insides of UFOs are not searched."""
+    ufo_paths = []
+    for dir_path, dir_names, file_names in os.walk(folder):
+        for dir_name in list(dir_names):
+            if dir_name.startswith('.'):
+                dir_names.remove(dir_name)
+            elif dir_name.lower().endswith('.ufo'):
+                dir_names.remove(dir_name)
+                ufo_paths.append(os.path.join(dir_path, dir_name))
+    return sorted(ufo_paths)
+
+
+def ufo_size(path):
+    """A cheap estimate of the size of a UFO: the size of its default
+       layer's contents.plist, which grows with the number of glyphs."""
+    try:
+        return os.path.getsize(os.path.join(path, 'glyphs', 'contents.plist'))
+    except OSError:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+
+class Checkpoint(object):
+    """A JSON-lines file listing the fonts already processed. Its first
+       line holds a key describing the run (e.g. a hash of the tool's name
+       and of its anchors file); a file written for another key is ignored
+       and started over."""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.done = set()
+        if os.path.isfile(path):
+            self._load()
+        if not self.done:
+            self._write_header()
+
+    def _load(self):
+        with io.open(self.path, 'r', encoding='utf-8') as checkpoint_file:
+            lines = checkpoint_file.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get('key') != self.key:
+            print('WARNING: Checkpoint %s is from another run. Starting over.'
+                  % self.path)
+            return
+        for line in lines[1:]:
+            try:
+                self.done.add(json.loads(line)['path'])
+            except (ValueError, KeyError, TypeError):
+                # the last line may have been cut short by the interruption
+                continue
+
+    def _write_header(self):
+        with io.open(self.path, 'w', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write(json.dumps({'key': self.key}) + u'\n')
+
+    def is_done(self, path):
+        return os.path.abspath(path) in self.done
+
+    def record(self, path):
+        path = os.path.abspath(path)
+        self.done.add(path)
+        with io.open(self.path, 'a', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write(json.dumps({'path': path}) + u'\n')
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_checkpoint(opts, tool_name, *file_paths):
+    """Returns the Checkpoint asked for by the --checkpoint option, or None.
+       Its key is made from tool_name and the contents of file_paths (e.g.
+       the anchors file), so that editing the file starts the run over."""
+    if not opts.checkpoint:
+        return None
+    if opts.dry_run:
+        print('WARNING: --checkpoint is ignored on a dry run.')
+        return None
+    sha = hashlib.sha1(tool_name.encode('utf-8'))
+    for file_path in file_paths:
+        with open(file_path, 'rb') as key_file:
+            sha.update(key_file.read())
+    return Checkpoint(opts.checkpoint, sha.hexdigest())
+
+
+def _init_worker(func, data):
+    global _worker_func, _worker_data
+    _worker_func = func
+    _worker_data = data
+
+
+def _run_one(path):
+    try:
+        return FontResult(path, value=_worker_func(path, _worker_data))
+    except Exception as exc:
+        return FontResult(path, error='%s: %s' % (type(exc).__name__, exc))
+
+
+def _run_indexed(task):
+    index, path = task
+    return index, _run_one(path)
+
+
+def run_batch(func, paths, data, jobs=1, checkpoint=None):
+    """Calls func(path, data) for each path and returns a list of
+       FontResult objects in the order of paths. Exceptions raised by
+       func are recorded in the result instead of being propagated.
+       Paths already done according to checkpoint are skipped (and left
+       out of the results); the others are recorded in it as they succeed."""
+    if checkpoint is not None:
+        skipped_count = len([path for path in paths if checkpoint.is_done(path)])
+        if skipped_count:
+            print('%d fonts were already done according to %s. Skipped.' % (
+                skipped_count, checkpoint.path))
+            paths = [path for path in paths if not checkpoint.is_done(path)]
+
+    if jobs is None or jobs < 1:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(paths))
+
+    results = [None] * len(paths)
+    if jobs <= 1:
+        _init_worker(func, data)
+        for index, path in enumerate(paths):
+            results[index] = _run_one(path)
+            _record(checkpoint, results[index])
+    else:
+        # largest first, so that the last fonts to finish are small ones
+        tasks = sorted(enumerate(paths), key=lambda task: -ufo_size(task[1]))
+        pool = multiprocessing.Pool(
+            jobs, initializer=_init_worker, initargs=(func, data))
+        try:
+            # with chunksize=1 each worker takes the next font as soon as
+            # it is free; the results are put back in the order of paths
+            for index, result in pool.imap_unordered(
+                    _run_indexed, tasks, chunksize=1):
+                results[index] = result
+                _record(checkpoint, result)
+        finally:
+            pool.close()
+            pool.join()
+
+    if checkpoint is not None and all(
+            result.error is None for result in results):
+        checkpoint.remove()
+    return results
+
+
+def _record(checkpoint, result):
+    if checkpoint is not None and result.error is None:
+        checkpoint.record(result.path)
+
+
+def print_summary(results, message, dry_run=False):
+    """Prints one entry per font (in input order), followed by any errors.
+       The value of each result is a (count, glyph_names) tuple, a
+       (count, glyph_names, missing_names) tuple, or a (count, glyph_names,
+       missing_names, errors) tuple, errors being the messages of the
+       problems found in that font; 'message' is formatted
+       with the count, e.g. '%d anchors placed'; the count may also be a
+       tuple of counts, for a message with several %d. The names of the glyphs
+       that aren't in the font are listed, and on a dry run the names of the
+       glyphs that would be written are listed as well.
+       Returns 1 if any font failed, 0 otherwise."""
+    failed = []
+    # UFOs found with --recursive may share file names; show their paths then
+    file_names = [os.path.basename(os.path.normpath(result.path))
+                  for result in results]
+    show_paths = len(set(file_names)) < len(file_names)
+    for result, file_name in zip(results, file_names):
+        if result.error is not None:
+            failed.append(result)
+            continue
+        count, glyph_names = result.value[:2]
+        missing_names = result.value[2] if len(result.value) > 2 else []
+        errors = result.value[3] if len(result.value) > 3 else []
+        if isinstance(count, tuple) and not any(count):
+            count = 0
+        if count or missing_names or errors:
+            print(os.path.normpath(result.path) if show_paths else file_name)
+        if count:
+            print('  ' + message % count)
+            if dry_run:
+                print('  %d glyphs would be written: %s' % (
+                    len(glyph_names), ' '.join(glyph_names)))
+        if missing_names:
+            print('  %d glyphs are not in the font: %s' % (
+                len(missing_names), ' '.join(sorted(missing_names))))
+        for error in errors:
+            print('  ERROR: %s. Skipped.' % error)
+
+    for result in failed:
+        print('ERROR: %s could not be processed.' % result.path)
+        print('  ' + result.error)
+
+    return 1 if failed else 0
@@ -0,0 +1,109 @@
+"""
+Persistent cache of glyph bounds, for placing anchors by keyword.
+
+Computing a glyph's bounds means walking its outlines, and the outlines of
+all its components, recursively. When the same anchors file is applied to a
+font again, almost all of those bounds are the same as the last time.
+
+BoundsCache stores the bounds of each glyph in a hidden file next to the UFO,
+named '.<UFO name>.boundscache', together with a hash of the glyph's outline
+data (its points, plus the transformations and outline hashes of its
+components). A cached value is used when the hash still matches.
+
+    cache = BoundsCache(font)
+    bounds = cache.bounds(font['Aacute'])
+    cache.save()
+"""
+from __future__ import print_function
+
+import hashlib
+import io
+import json
+import os
+
+from fontTools.pens.recordingPen import RecordingPointPen
+
+from .anchors_cache import write_atomically
+
+
+CACHE_SUFFIX = '.boundscache'
+_VERSION = 1
+
+
+def cache_path(font_path):
+    folder, file_name = os.path.split(os.path.abspath(font_path))
+    return os.path.join(folder, '.%s%s' % (file_name, CACHE_SUFFIX))
+
+
+class BoundsCache(object):
+    """Bounds of the glyphs of a defcon layer (the font's default layer,
+       unless one is given), looked up by glyph name and outline hash."""
+
+    def __init__(self, font, layer=None):
+        self._layer = layer if layer is not None else font.layers.defaultLayer
+        self._path = cache_path(font.path) if font.path else None
+        self._entries = {}  # glyph name -> [outline hash, bounds or None]
+        self._hashes = {}  # outline hashes computed during this run
+        self._changed = False
+        self._load()
+
+    def _load(self):
+        if self._path is None or not os.path.isfile(self._path):
+            return
+        try:
+            with io.open(self._path, 'r', encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == _VERSION:
+            self._entries = data.get('glyphs', {})
+
+    def outline_hash(self, glyph):
+        """Returns a hash of the outline data of glyph, including that of
+           its components."""
+        digest = self._hashes.get(glyph.name)
+        if digest is not None:
+            return digest
+
+        # drawing the glyph is much faster than iterating over its points
+        pen = RecordingPointPen()
+        glyph.drawPoints(pen)
+        outline = pen.value
+        for component in glyph.components:
+            base_name = component.baseGlyph
+            if base_name in self._layer:
+                outline.append(self.outline_hash(self._layer[base_name]))
+        sha = hashlib.sha1(repr(outline).encode('utf-8'))
+
+        digest = self._hashes[glyph.name] = sha.hexdigest()
+        return digest
+
+    def bounds(self, glyph):
+        """Returns the (xMin, yMin, xMax, yMax) bounds of glyph, or None if
+           it has no outlines."""
+        digest = self.outline_hash(glyph)
+        entry = self._entries.get(glyph.name)
+        if entry is not None and entry[0] == digest:
+            return tuple(entry[1]) if entry[1] is not None else None
+
+        bounds = glyph.bounds
+        self._entries[glyph.name] = [
+            digest, list(bounds) if bounds is not None else None]
+        self._changed = True
+        return bounds
+
+    def save(self):
+        """Writes the cache file, if any bounds were computed. The entries
+           of glyphs no longer in the layer are dropped."""
+        if self._path is None or not self._changed:
+            return
+        glyphs = dict((name, entry) for name, entry in self._entries.items()
+                      if name in self._layer)
+        data = json.dumps({'version': _VERSION, 'glyphs': glyphs},
+                          separators=(',', ':'), sort_keys=True)
+        try:
+            write_atomically(self._path, data.encode('utf-8'))
+        except (IOError, OSError):
+            # the folder may be read-only; the cache is just an optimization
+            return
+        self._changed = False
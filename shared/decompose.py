@@ -0,0 +1,191 @@
+"""
+Bulk decomposition of composite glyphs.
+
+Decomposing composites one at a time (e.g. with glyph.decompose()) resolves
+the component chain of each of them from scratch, so a base shared by
+hundreds of accented letters is flattened and transformed hundreds of times.
+Decomposer flattens a glyph the first time it is asked for it: it reads the
+outlines of the glyph and of the bases it uses that weren't flattened yet,
+builds their component graph, and flattens them in topological order, bases
+first. The flattened outlines of each glyph are kept, so flattening a
+composite only means transforming the already flattened outlines of its
+bases. The bases are always taken from the layer given to the Decomposer.
+Points offset by whole numbers stay whole numbers.
+
+Works with defcon, fontParts and RoboFont glyphs.
+
+    decomposer = Decomposer(font)
+    decomposer.draw_flattened('Aacute', mask_glyph.getPointPen())
+"""
+from fontTools.misc.transform import Transform
+from fontTools.pens.recordingPen import RecordingPointPen
+
+
+_IDENTITY = (1, 0, 0, 1, 0, 0)
+
+
+def _record(glyph):
+    pen = RecordingPointPen()
+    glyph.drawPoints(pen)
+    return pen.value
+
+
+def component_graph(recordings):
+    """recordings maps glyph names to the RecordingPointPen values of the
+       glyphs. Returns a dict mapping the same names to the lists of the
+       names of their components' base glyphs that are in recordings."""
+    graph = {}
+    for glyph_name, recording in recordings.items():
+        graph[glyph_name] = [args[0] for operator, args, _ in recording
+                             if operator == 'addComponent' and
+                             args[0] in recordings]
+    return graph
+
+
+def topological_order(graph):
+    """Returns the names of graph, each one after the names it refers to.
+       In a cycle of components, the one that closes the cycle is ignored."""
+    order = []
+    visited = set()
+    for root in graph:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(graph[root]))]
+        while stack:
+            glyph_name, base_names = stack[-1]
+            for base_name in base_names:
+                if base_name not in visited:
+                    visited.add(base_name)
+                    stack.append((base_name, iter(graph[base_name])))
+                    break
+            else:
+                stack.pop()
+                order.append(glyph_name)
+    return order
+
+
+def _whole(value):
+    """Returns value as an int if it is a whole number (fontParts gives
+       the offsets of components as floats)."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _offset_point(dx, dy):
+    dx, dy = _whole(dx), _whole(dy)
+
+    def offset_point(point):
+        return point[0] + dx, point[1] + dy
+    return offset_point
+
+
+def _transform_point(transformation):
+    transform = Transform(*transformation).transformPoint
+
+    def transform_point(point):
+        x, y = transform(point)
+        return _whole(x), _whole(y)
+    return transform_point
+
+
+def _transformed(outline, transformation):
+    """Returns the RecordingPointPen value 'outline' transformed, without
+       point and contour identifiers (they'd clash with those of the
+       other copies of the same base)."""
+    transformation = tuple(transformation)
+    if transformation == _IDENTITY:
+        transform_point = None
+    elif transformation[:4] == _IDENTITY[:4]:
+        transform_point = _offset_point(*transformation[4:])
+    else:
+        transform_point = _transform_point(transformation)
+    result = []
+    for operator, args, kwargs in outline:
+        if operator == 'addPoint':
+            point, segment_type, smooth, name = args
+            if transform_point is not None:
+                point = transform_point(point)
+            args = (point, segment_type, smooth, name)
+        kwargs = dict((key, value) for key, value in kwargs.items()
+                      if key != 'identifier')
+        result.append((operator, args, kwargs))
+    return result
+
+
+class Decomposer(object):
+    """Flattened outlines of the glyphs of 'layer' (anything with the 'in'
+       operator and item access by glyph name: a defcon or fontParts layer,
+       or a font for its default layer), computed on demand."""
+
+    def __init__(self, layer):
+        self._layer = layer
+        self._recordings = {}
+        self._flattened = {}
+
+    def _recording(self, glyph_name):
+        recording = self._recordings.get(glyph_name)
+        if recording is None:
+            recording = self._recordings[glyph_name] = _record(
+                self._layer[glyph_name])
+        return recording
+
+    def _flatten_closure(self, glyph_name):
+        """Flattens the glyph and the bases it uses that weren't
+           flattened yet."""
+        recordings = {}
+        pending = [glyph_name]
+        while pending:
+            glyph_name = pending.pop()
+            if glyph_name in recordings:
+                continue
+            recording = recordings[glyph_name] = self._recording(glyph_name)
+            for operator, args, _ in recording:
+                if (operator == 'addComponent' and
+                        args[0] not in recordings and
+                        args[0] not in self._flattened and
+                        args[0] in self._layer):
+                    pending.append(args[0])
+
+        for glyph_name in topological_order(component_graph(recordings)):
+            self._flattened[glyph_name] = self._flatten(recordings[glyph_name])
+
+    def _flatten(self, recording):
+        if not any(operator == 'addComponent' for operator, _, _ in recording):
+            return recording
+        outline = []
+        for operator, args, kwargs in recording:
+            if operator != 'addComponent':
+                outline.append((operator, args, kwargs))
+                continue
+            base_name, transformation = args[0], args[1]
+            # missing for a base that isn't in the layer, or closes a cycle
+            base_outline = self._flattened.get(base_name)
+            if base_outline:
+                outline.extend(_transformed(base_outline, transformation))
+        return outline
+
+    def flattened(self, glyph_name):
+        """Returns the RecordingPointPen value of the glyph's outlines,
+           with its components decomposed."""
+        outline = self._flattened.get(glyph_name)
+        if outline is None:
+            self._flatten_closure(glyph_name)
+            outline = self._flattened[glyph_name]
+        return outline
+
+    def draw_flattened(self, glyph_name, point_pen):
+        """Draws the glyph's outlines, with its components decomposed."""
+        for operator, args, kwargs in self.flattened(glyph_name):
+            getattr(point_pen, operator)(*args, **kwargs)
+
+    def draw_components(self, glyph_name, point_pen):
+        """Draws the decomposed outlines of the glyph's components only."""
+        for operator, args, _ in self._recording(glyph_name):
+            if operator != 'addComponent' or args[0] not in self._layer:
+                continue
+            base_name, transformation = args[0], args[1]
+            for base_operator, base_args, kwargs in _transformed(
+                    self.flattened(base_name), transformation):
+                getattr(point_pen, base_operator)(*base_args, **kwargs)
@@ -0,0 +1,97 @@
+"""
+Restricted arithmetic expressions, for the coordinates of anchors files.
+
+An expression may use numbers, the + - * / operators, parentheses, and the
+names of the font metrics in FONT_METRICS, e.g. 'xHeight+20' or
+'(capHeight+ascender)/2'. Anything else (function calls, attributes, other
+names or operators) is rejected, so files from outside contributors can't
+run arbitrary code the way eval() would let them.
+
+Compiled expressions are memoized by their text, so an expression repeated
+on many lines of a file is only compiled once. An expression that doesn't
+use font metrics can be evaluated right away; one that does is evaluated for
+each font, with the values returned by font_metrics().
+"""
+from __future__ import division
+
+import ast
+import functools
+import math
+
+
+# names of the fontinfo attributes that expressions can refer to
+FONT_METRICS = ('ascender', 'capHeight', 'descender', 'unitsPerEm', 'xHeight')
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.UAdd, ast.USub)
+
+
+class Expression(object):
+    """A compiled expression. 'names' holds the font metrics it uses."""
+    __slots__ = ('text', 'names', '_code')
+
+    def __init__(self, text, names, code):
+        self.text = text
+        self.names = names
+        self._code = code
+
+    def evaluate(self, metrics=None):
+        """Returns the value of the expression. metrics is a dict of the
+           values of the font metrics it uses. Raises ValueError if one
+           of them is missing, if the expression divides by zero, or if
+           its value is infinite or too large."""
+        missing = [name for name in self.names
+                   if metrics is None or name not in metrics]
+        if missing:
+            raise ValueError('the font has no %s value' % missing[0])
+        try:
+            value = eval(self._code, {'__builtins__': {}}, metrics or {})
+            # isfinite() raises OverflowError for ints too large for a float
+            finite = math.isfinite(value)
+        except ZeroDivisionError:
+            raise ValueError('division by zero in %r' % self.text)
+        except OverflowError:
+            finite = False
+        if not finite:
+            raise ValueError('%r is too large' % self.text)
+        return value
+
+    def __repr__(self):
+        return 'Expression(%r)' % self.text
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(text):
+    """Returns the Expression for text. Raises ValueError if text isn't a
+       valid expression."""
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError('%r is not a valid expression' % text)
+
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError('%r is not allowed in expressions' % text)
+        if isinstance(node, ast.Constant) and (
+                isinstance(node.value, bool) or
+                not isinstance(node.value, (int, float))):
+            raise ValueError('%r is not a number' % node.value)
+        if isinstance(node, ast.Name):
+            if node.id not in FONT_METRICS:
+                raise ValueError('unknown name %r' % node.id)
+            names.add(node.id)
+
+    code = compile(tree, '<expression>', 'eval', dont_inherit=True)
+    return Expression(text, frozenset(names), code)
+
+
+def font_metrics(font):
+    """Returns a dict of the values of the FONT_METRICS the font has."""
+    metrics = {}
+    for name in FONT_METRICS:
+        value = getattr(font.info, name, None)
+        if value is not None:
+            metrics[name] = value
+    return metrics
@@ -0,0 +1,112 @@
+"""
+Glyph access for the defcon anchor tools.
+
+Testing 'name in font.keys()' for each line of an anchors file makes defcon
+build a new collection of the font's glyph names each time. FontGlyphs reads
+the names of a layer once, resolves all the glyph names of an anchors file
+against them in one pass, and keeps the names that aren't in the font, so
+that they can be reported together once the font is done.
+
+    glyphs = FontGlyphs(font)
+    for glyph_name in glyphs.resolve(anchors):
+        glyph = glyphs[glyph_name]
+    print(glyphs.missing)
+
+open_ufo() opens a UFO either as a defcon Font, or, in lazy mode, as a
+LazyFont: a defcon Layer over the UFO's default glyph set, with no Font
+around it. A LazyFont reads contents.plist and nothing else until a glyph is
+accessed, then reads only that glyph's .glif file. As its glyphs aren't
+observed by a font, loading them doesn't send any notifications, which is
+where most of the time of loading glyphs into a defcon Font goes.
+"""
+import os
+
+from defcon import Font, Info
+from defcon.objects.layer import Layer
+from fontTools.ufoLib import UFOReader
+
+
+class FontGlyphs(object):
+    """The glyphs of a layer of a defcon font (its default layer, unless
+       layer_name is given), with their names read once."""
+
+    def __init__(self, font, layer_name=None):
+        if layer_name is None:
+            self.layer = font.layers.defaultLayer
+        else:
+            self.layer = font.layers[layer_name]
+        self.names = set(self.layer.keys())
+        self.missing = []
+
+    def resolve(self, glyph_names):
+        """Returns the list of the names in glyph_names that are in the
+           layer, in the same order. The others are added to self.missing."""
+        names = self.names
+        found = []
+        for glyph_name in glyph_names:
+            if glyph_name in names:
+                found.append(glyph_name)
+            else:
+                self.missing.append(glyph_name)
+        return found
+
+    def __contains__(self, glyph_name):
+        return glyph_name in self.names
+
+    def __getitem__(self, glyph_name):
+        return self.layer[glyph_name]
+
+
+class _DefaultLayerSet(object):
+    """The part of defcon's LayerSet API used by the anchor tools."""
+
+    def __init__(self, layer):
+        self.defaultLayer = layer
+
+    def __getitem__(self, layer_name):
+        if layer_name != self.defaultLayer.name:
+            raise KeyError('%s is not the default layer' % layer_name)
+        return self.defaultLayer
+
+
+class LazyFont(object):
+    """The default layer, info and path of a UFO, with the glyphs read
+       only when they are accessed. It can't be saved as a whole; the
+       modified glyphs are written back with shared.ufo_save.save_glyphs."""
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            raise ValueError('%s is not a UFO folder' % path)
+        self.path = path
+        self._reader = UFOReader(path, validate=False)
+        glyph_set = self._reader.getGlyphSet(validateRead=False)
+        layer = Layer(glyphSet=glyph_set)
+        layer.name = self._reader.getDefaultLayerName()
+        # keep the layer's color and lib, so that they aren't seen as changed
+        glyph_set.readLayerInfo(layer, validateRead=False)
+        self.layers = _DefaultLayerSet(layer)
+        self._info = None
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = Info()
+            self._reader.readInfo(self._info, validate=False)
+        return self._info
+
+    def keys(self):
+        return self.layers.defaultLayer.keys()
+
+    def __contains__(self, glyph_name):
+        return glyph_name in self.layers.defaultLayer
+
+    def __getitem__(self, glyph_name):
+        return self.layers.defaultLayer[glyph_name]
+
+
+def open_ufo(path, lazy=False):
+    """Opens the UFO at path as a defcon Font, or as a LazyFont if lazy
+       is True."""
+    if lazy:
+        return LazyFont(path)
+    return Font(path)
@@ -0,0 +1,260 @@
+"""
+Editing of anchors directly in .glif files.
+
+Deleting or renaming anchors, or adding anchors at known coordinates, only
+changes the <anchor> elements of a glyph. patch_font_anchors() finds those
+elements in the text of each targeted .glif file of a UFO's default layer,
+lets a tool-specific function edit them, and rewrites just those elements.
+The rest of the file is left byte-for-byte as it was, so the version control
+diffs only show the anchor lines. Each file is replaced atomically. No defcon
+objects are built, and no other file of the UFO is read.
+
+The edit function gets the list of the glyph's GlifAnchor objects, which it
+can reorder, shorten, rename or append to, and returns the number of
+anchors it changed. A glyph it can't handle this way (e.g. an anchor whose
+position depends on the glyph's outlines) is reported by raising
+CannotPatch. Such glyphs, and those whose .glif file is in format 1 or has
+XML comments or CDATA sections, are edited by the tool's regular function
+instead, through a defcon font.
+"""
+from __future__ import print_function
+
+import os
+import plistlib
+import re
+
+from .anchors_cache import write_atomically
+from .font_access import open_ufo
+from .profiling import count, phase
+
+
+# the default layer's folder, in UFO 2 as well as UFO 3
+DEFAULT_LAYER_FOLDER = 'glyphs'
+
+_ANCHOR_RE = re.compile(r'<anchor\b[^>]*?(?:/>|>\s*</anchor>)', re.DOTALL)
+_ATTRIBUTE_RE = re.compile(r'''([\w.:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+_FORMAT_RE = re.compile(r'''<glyph\b[^>]*?\bformat\s*=\s*["'](\d+)''')
+_NAME_VALUE_RE = re.compile(r'''(\bname\s*=\s*)(["'])(.*?)\2''', re.DOTALL)
+# the elements that follow the anchors in a .glif file, in order
+_FOLLOWING_RE = re.compile(r'<outline\b|<lib\b|</glyph>')
+
+_ESCAPES = [('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;')]
+
+
+class CannotPatch(Exception):
+    """Raised when a glyph's anchors can't be edited in its .glif text."""
+
+
+def _escape(value):
+    for character, entity in _ESCAPES:
+        value = value.replace(character, entity)
+    return value
+
+
+def _unescape(value):
+    if '&#' in value:
+        raise CannotPatch('character reference in an attribute')
+    for character, entity in reversed(_ESCAPES):
+        value = value.replace(entity, character)
+    return value.replace('&apos;', "'")
+
+
+class GlifAnchor(object):
+    """An <anchor> element of a .glif file. 'text' is the element as it is
+       in the file, or None for an anchor added by the edit function."""
+    __slots__ = ('name', 'x', 'y', 'text', 'original_name', 'start', 'end')
+
+    def __init__(self, name, x, y, text=None, start=None, end=None):
+        self.name = self.original_name = name
+        self.x = x
+        self.y = y
+        self.text = text
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_element(cls, match):
+        attributes = {}
+        for key, double_quoted, single_quoted in _ATTRIBUTE_RE.findall(
+                match.group(0)):
+            value = double_quoted if double_quoted or not single_quoted else single_quoted
+            attributes[key] = _unescape(value)
+        return cls(attributes.get('name'), attributes.get('x'),
+                   attributes.get('y'), match.group(0),
+                   match.start(), match.end())
+
+    def to_text(self):
+        if self.text is None:
+            return '<anchor x="%s" y="%s" name="%s"/>' % (
+                _format_number(self.x), _format_number(self.y),
+                _escape(self.name))
+        if self.name == self.original_name:
+            return self.text
+        match = _NAME_VALUE_RE.search(self.text)
+        if match is None:
+            # a nameless anchor was given a name
+            return self.text.replace(
+                '<anchor', '<anchor name="%s"' % _escape(self.name), 1)
+        value = _escape(self.name)
+        if match.group(2) == "'":
+            value = value.replace('&quot;', '"').replace("'", '&apos;')
+        return '%s%s%s%s%s%s' % (
+            self.text[:match.start()], match.group(1), match.group(2),
+            value, match.group(2), self.text[match.end():])
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return '%s' % value
+
+
+def _line_start(text, index):
+    return text.rfind('\n', 0, index) + 1
+
+
+def _indentation(text, index):
+    """Returns the whitespace between the start of the line and index, or
+       None if there's anything else in between."""
+    prefix = text[_line_start(text, index):index]
+    return prefix if not prefix.strip() else None
+
+
+def patch_glif_text(text, edit_func):
+    """Returns the text of a .glif file with its anchors edited by
+       edit_func, and the count returned by edit_func. The text is returned
+       unchanged when the count is 0."""
+    format_match = _FORMAT_RE.search(text)
+    if format_match is None or format_match.group(1) == '1':
+        raise CannotPatch('GLIF format 1')
+    if '<!--' in text or '<![CDATA[' in text:
+        raise CannotPatch('comments or CDATA')
+
+    anchors = [GlifAnchor.from_element(match)
+               for match in _ANCHOR_RE.finditer(text)]
+    original = list(anchors)
+    changed_count = edit_func(anchors)
+    if not changed_count:
+        return text, 0
+
+    newline = '\r\n' if '\r\n' in text else '\n'
+    kept = set(id(anchor) for anchor in anchors)
+    pieces = []
+    position = 0
+    for anchor in original:
+        if id(anchor) in kept and anchor.name == anchor.original_name:
+            continue
+        pieces.append(text[position:anchor.start])
+        if id(anchor) in kept:
+            pieces.append(anchor.to_text())
+            position = anchor.end
+            continue
+        # remove the element's whole line, when it is alone on it
+        indentation = _indentation(text, anchor.start)
+        end = anchor.end
+        if indentation is not None and text.startswith(newline, end):
+            pieces[-1] = pieces[-1][:len(pieces[-1]) - len(indentation)]
+            end += len(newline)
+        position = end
+    pieces.append(text[position:])
+    text = ''.join(pieces)
+
+    added = [anchor for anchor in anchors if anchor.text is None]
+    if added:
+        text = _insert_anchors(text, added, newline)
+    return text, changed_count
+
+
+def _insert_anchors(text, added, newline):
+    """Inserts new <anchor> elements after the last one of the file, or
+       where the anchors belong if it has none."""
+    last = None
+    for last in _ANCHOR_RE.finditer(text):
+        pass
+    if last is not None:
+        indentation = _indentation(text, last.start()) or ''
+        insertion = ''.join(newline + indentation + anchor.to_text()
+                            for anchor in added)
+        return text[:last.end()] + insertion + text[last.end():]
+
+    following = _FOLLOWING_RE.search(text)
+    if following is None:
+        raise CannotPatch('no </glyph> tag')
+    indentation = _indentation(text, following.start())
+    if indentation is None:
+        raise CannotPatch('unexpected layout')
+    if following.group(0) == '</glyph>':
+        indentation += '  '
+    start = _line_start(text, following.start())
+    insertion = ''.join(indentation + anchor.to_text() + newline
+                        for anchor in added)
+    return text[:start] + insertion + text[start:]
+
+
+def _read_contents(ufo_path):
+    with open(os.path.join(ufo_path, DEFAULT_LAYER_FOLDER,
+                           'contents.plist'), 'rb') as contents_file:
+        return plistlib.load(contents_file)
+
+
+def patch_font_anchors(path, anchors, edit_func, fallback_func,
+                       dry_run=False, lazy=False):
+    """anchors is a tool's dict of anchors, keyed by glyph name. For each
+       of its glyphs, edit_func(glif_anchors, anchors[glyph_name]) edits
+       the anchors of the glyph's .glif file, as described above. The
+       glyphs it can't edit are given to fallback_func(font, anchors,
+       dry_run), the tool's regular function, on the font opened by
+       open_ufo(path, lazy).
+       Returns the total count, the sorted list of the names of the
+       modified glyphs, and the list of the glyph names that aren't in
+       the font, like the tools' regular functions."""
+    if not os.path.isdir(path):
+        raise ValueError('%s is not a UFO folder' % path)
+
+    with phase('load'):
+        contents = _read_contents(path)
+    layer_folder = os.path.join(path, DEFAULT_LAYER_FOLDER)
+
+    total_count = 0
+    patched = {}  # file path -> new data
+    modified_glyphs = []
+    missing = []
+    fallback_anchors = {}
+    with phase('apply'):
+        for glyph_name, glyph_anchors in anchors.items():
+            file_name = contents.get(glyph_name)
+            if file_name is None:
+                missing.append(glyph_name)
+                continue
+            file_path = os.path.join(layer_folder, file_name)
+            with open(file_path, 'rb') as glif_file:
+                data = glif_file.read()
+            try:
+                text, changed_count = patch_glif_text(
+                    data.decode('utf-8'),
+                    lambda glif_anchors: edit_func(glif_anchors, glyph_anchors))
+            except CannotPatch:
+                fallback_anchors[glyph_name] = glyph_anchors
+                continue
+            if changed_count:
+                total_count += changed_count
+                patched[file_path] = text.encode('utf-8')
+                modified_glyphs.append(glyph_name)
+    count('glyphs_touched', len(modified_glyphs))
+
+    if not dry_run and patched:
+        with phase('save'):
+            for file_path, data in patched.items():
+                write_atomically(file_path, data)
+        count('glyphs_written', len(patched))
+
+    if fallback_anchors:
+        with phase('load'):
+            font = open_ufo(path, lazy)
+        fallback_count, fallback_glyphs, fallback_missing = fallback_func(
+            font, fallback_anchors, dry_run)
+        total_count += fallback_count
+        modified_glyphs.extend(fallback_glyphs)
+        missing.extend(fallback_missing)
+
+    return total_count, sorted(modified_glyphs), missing
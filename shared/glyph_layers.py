@@ -0,0 +1,57 @@
+"""
+Layer access that works with both RoboFont glyphs and fontParts glyphs.
+
+RoboFont's glyph.getLayer() accepts a 'clear' argument and creates the layer
+if needed, and its glyphs have a copyToLayer() method. Plain fontParts glyphs
+have neither, so the Mask scripts go through these functions instead.
+"""
+
+
+def _glyph_font(glyph):
+    font = getattr(glyph, 'font', None)
+    if font is None:
+        font = glyph.getParent()
+    return font
+
+
+def get_layer_glyph(glyph, layer_name, clear=False, create=True):
+    """Returns the glyph with the same name in the layer named layer_name,
+       creating the layer and the glyph if necessary. With clear=True the
+       returned glyph is emptied. With create=False, None is returned
+       instead of creating anything (RoboFont always creates the glyph)."""
+    try:
+        return glyph.getLayer(layer_name, clear=clear)
+    except TypeError:
+        # not RoboFont; getLayer() doesn't take a 'clear' argument
+        pass
+
+    font = _glyph_font(glyph)
+    if layer_name not in font.layerOrder:
+        if not create:
+            return None
+        font.newLayer(layer_name)
+    layer = font.getLayer(layer_name)
+    if glyph.name in layer:
+        layer_glyph = layer[glyph.name]
+        if clear:
+            layer_glyph.clear()
+    elif not create:
+        return None
+    else:
+        layer_glyph = layer.newGlyph(glyph.name)
+        layer_glyph.width = glyph.width
+    return layer_glyph
+
+
+def copy_to_layer(glyph, layer_name, clear=True):
+    """Copies the outlines of glyph into the glyph with the same name in the
+       layer named layer_name. With clear=False the outlines are added to
+       those already there. Returns the glyph in the other layer."""
+    if hasattr(glyph, 'copyToLayer'):
+        glyph.copyToLayer(layer_name, clear=clear)
+        return glyph.getLayer(layer_name, clear=False)
+
+    layer_glyph = get_layer_glyph(glyph, layer_name, clear=clear)
+    layer_glyph.width = glyph.width
+    glyph.drawPoints(layer_glyph.getPointPen())
+    return layer_glyph
@@ -0,0 +1,160 @@
+"""
+Compiled GOADB (GlyphOrderAndAliasDB) files.
+
+A GOADB line holds a final glyph name, a production glyph name and,
+optionally, a Unicode override: one or more comma-separated values, each
+written uniXXXX, uXXXX[X[X]] or just XXXX[X[X]] in hexadecimal (e.g.
+'uni0020,uni00A0', 'u1F600' or '0020'). A line whose override isn't valid
+keeps its names, and gets the Unicode value of its final name instead.
+Working out the Unicode values of each line means matching the final name
+against the uniXXXX and uXXXXX patterns, parsing the override, and looking
+the final name up in the Adobe Glyph List. read_goadb() does that once per
+file and returns a GOADBIndex, which holds the production to final name map,
+the list of Unicode values of each production name and the reverse index of
+production names by Unicode value.
+
+The compiled data is stored next to the GOADB, in the same kind of sidecar
+as the parsed anchors files (see shared.anchors_cache), which decides when
+it is stale and prunes the old ones. It is written with marshal, which loads
+the name maps about three times faster than parsing the GOADB again. So a
+GOADB shared by many fonts is only parsed once.
+
+    goadb = read_goadb('GlyphOrderAndAliasDB')
+    goadb.unicodes['a']     # [0x61]
+    goadb.final_names['a']  # 'a'
+    goadb.codepoints[0x61]  # ['a']
+"""
+from __future__ import print_function
+
+import io
+import re
+
+from fontTools.agl import AGL2UV
+
+from .anchors_cache import cached_parse
+
+
+_UNI_NAME_RE = re.compile(r'^uni[A-F0-9]{4}$')
+_U_NAME_RE = re.compile(r'^u[A-F0-9]{5}$')
+_OVERRIDE_RE = re.compile(r'^(?:uni|u)?([A-Fa-f0-9]{4,6})$')
+MAX_UNICODE = 0x10FFFF
+
+
+class GOADBIndex(object):
+    """The data of a GOADB file. 'final_names' maps the production glyph
+       names to the final ones, in the order of the file, and 'unicodes'
+       maps the production names to the lists of their Unicode values.
+       'skipped' lists the (line number, line) of the lines that couldn't
+       be read, and 'bad_overrides' those of the lines whose Unicode
+       override was ignored."""
+
+    def __init__(self, final_names, unicodes, skipped=(), bad_overrides=()):
+        self.final_names = final_names
+        self.unicodes = unicodes
+        self.skipped = list(skipped)
+        self.bad_overrides = list(bad_overrides)
+        self._codepoints = None
+
+    @property
+    def codepoints(self):
+        """A dict mapping each Unicode value to the list of the production
+           names that have it, built the first time it is used."""
+        if self._codepoints is None:
+            codepoints = {}
+            for glyph_name, values in self.unicodes.items():
+                for value in values:
+                    codepoints.setdefault(value, []).append(glyph_name)
+            self._codepoints = codepoints
+        return self._codepoints
+
+
+def parse_override(uni_override):
+    """Returns the list of the Unicode values of a GOADB override, e.g.
+       [0x20, 0xA0] for 'uni0020,uni00A0'. Raises ValueError if one of
+       them isn't valid."""
+    values = []
+    for item in uni_override.split(','):
+        match = _OVERRIDE_RE.match(item)
+        value = int(match.group(1), 16) if match else None
+        if value is None or value > MAX_UNICODE:
+            raise ValueError('invalid Unicode override %r' % item)
+        if value not in values:
+            values.append(value)
+    return values
+
+
+def _line_unicodes(final_name, uni_override):
+    """Returns the list of Unicode values of a GOADB line, or None."""
+    # the final name is uniXXXX
+    if _UNI_NAME_RE.match(final_name):
+        return [int(final_name[-4:], 16)]
+    # the final name is uXXXXX
+    if _U_NAME_RE.match(final_name):
+        return [int(final_name[-5:], 16)]
+    # the GOADB line has a Unicode override
+    if uni_override:
+        return parse_override(uni_override)
+    # the final name is standard
+    value = AGL2UV.get(final_name)
+    return [value] if value is not None else None
+
+
+def parse_goadb(lines):
+    """Returns the GOADBIndex of the lines of a GOADB file."""
+    final_names = {}
+    unicodes = {}
+    skipped = []
+    bad_overrides = []
+
+    for line_number, line in enumerate(lines, 1):
+        entries = line.split()
+        if len(entries) < 2:
+            skipped.append((line_number, line))
+            continue
+        if entries[0][0] in ['%', '#']:
+            continue
+        final_name, production_name = entries[0], entries[1]
+        uni_override = entries[2] if len(entries) == 3 else None
+
+        try:
+            values = _line_unicodes(final_name, uni_override)
+        except ValueError:
+            bad_overrides.append((line_number, line))
+            values = _line_unicodes(final_name, None)
+        final_names[production_name] = final_name
+        if values is not None:
+            unicodes[production_name] = values
+
+    return GOADBIndex(final_names, unicodes, skipped, bad_overrides)
+
+
+def _parse_goadb_file(file_path):
+    with io.open(file_path, 'r', encoding='utf-8') as goadb_file:
+        return parse_goadb(goadb_file.read().splitlines())
+
+
+def _encode_goadb(goadb):
+    return (goadb.final_names, goadb.unicodes, goadb.skipped,
+            goadb.bad_overrides)
+
+
+def _decode_goadb(data):
+    return GOADBIndex(*data)
+
+
+def read_goadb(file_path, use_cache=True):
+    """Returns the GOADBIndex of a GOADB file, from its cache if possible
+       (and use_cache is True). The lines that couldn't be read are
+       reported."""
+    if use_cache:
+        goadb = cached_parse(file_path, 'goadb', _parse_goadb_file,
+                             _encode_goadb, _decode_goadb)
+    else:
+        goadb = _parse_goadb_file(file_path)
+
+    for line_number, line in goadb.skipped:
+        print('Skipped line number %d: %s' % (line_number, line))
+    for line_number, line in goadb.bad_overrides:
+        print('Ignored the Unicode override of line number %d: %s' %
+              (line_number, line))
+    return goadb
@@ -0,0 +1,40 @@
+"""
+Support for running the RoboFont scripts outside of RoboFont.
+
+Inside RoboFont a script works on CurrentFont(). Outside of it (e.g. on a
+Linux build server) the script's main() opens the UFOs given on the command
+line with fontParts, whose objects have the same API as RoboFont's.
+"""
+from __future__ import print_function
+
+import argparse
+
+from .profiling import add_profile_arguments
+
+
+def in_robofont():
+    """Returns True if the script is being run by RoboFont."""
+    try:
+        import mojo.roboFont  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def open_font(path):
+    """Opens a UFO as a fontParts font, without any user interface."""
+    from fontParts.world import OpenFont
+    return OpenFont(path, showInterface=False)
+
+
+def font_arguments_parser(description, fonts_required=True):
+    """Returns an argparse parser that takes one or more UFO paths (or any
+       number of them, if fonts_required is False).
+       Scripts can add their own arguments to it."""
+    parser = argparse.ArgumentParser(
+        description=description,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('fonts', nargs='+' if fonts_required else '*',
+                        metavar='font', help='path to a UFO font')
+    add_profile_arguments(parser)
+    return parser
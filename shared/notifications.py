@@ -0,0 +1,88 @@
+"""
+Batching of glyph change notifications for the RoboFont-side scripts.
+
+Calling glyph.update() (or glyphChangedUpdate(), or changed()) inside a loop
+over thousands of glyphs makes RoboFont run its observers and redraw its
+windows thousands of times, and each edit of a glyph (e.g. removing one
+anchor) posts a change notification of its own. GlyphChangeBatch holds the
+notifications of each glyph about to be edited, on that glyph only, for the
+length of a bulk operation, and releases them when the operation ends, so
+that each glyph's observers hear about its changes once.
+
+    with GlyphChangeBatch() as batch:
+        for glyph in font:
+            batch.will_change(glyph)
+            glyph.clearAnchors()
+
+The notifications aren't held font-wide: defcon queues held notifications in
+a list that it searches before adding each one, so holding every notification
+of a bulk edit made its cost grow with the square of the number of glyphs.
+"""
+
+
+def _naked(obj):
+    """Returns the defcon object wrapped by a RoboFont/fontParts object."""
+    if hasattr(obj, 'naked'):
+        return obj.naked()
+    return obj
+
+
+def send_glyph_update(glyph):
+    """Tells the glyph's observers that it changed, using whichever
+       method the glyph object provides."""
+    for method_name in ('changed', 'glyphChangedUpdate', 'update'):
+        method = getattr(glyph, method_name, None)
+        if method is not None:
+            method()
+            return
+
+
+class GlyphChangeBatch(object):
+    """Context manager that coalesces the change notifications of the
+       glyphs edited during a bulk operation. will_change(glyph), called
+       before a glyph is edited, holds the glyph's own notifications until
+       the batch ends. glyph_changed(glyph), called after a glyph was edited
+       without will_change(), schedules one update of the glyph for the end
+       of the batch. A glyph reported more than once is counted and updated
+       once."""
+
+    def __init__(self):
+        self._held = {}  # id of the defcon glyph -> defcon glyph
+        self._updated = {}  # id of the defcon glyph -> glyph to update
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            for glyph in self._updated.values():
+                send_glyph_update(glyph)
+        finally:
+            for glyph in self._held.values():
+                glyph.releaseHeldNotifications()
+        return False
+
+    def will_change(self, glyph):
+        """Holds the notifications of glyph, which is about to be edited,
+           until the batch ends."""
+        naked = _naked(glyph)
+        key = id(naked)
+        if key in self._held or key in self._updated:
+            return
+        if getattr(naked, 'dispatcher', None) is None:
+            # not in a font, so nothing observes it but the caller
+            self._updated[key] = glyph
+            return
+        naked.holdNotifications()
+        self._held[key] = naked
+
+    def glyph_changed(self, glyph):
+        """Schedules an update for glyph, which was edited without
+           will_change()."""
+        key = id(_naked(glyph))
+        if key not in self._held:
+            self._updated.setdefault(key, glyph)
+
+    def __len__(self):
+        """The number of glyphs reported as changed."""
+        return len(self._held) + len(self._updated)
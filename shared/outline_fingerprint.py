@@ -0,0 +1,63 @@
+"""
+Fingerprints of glyph outlines, for skipping glyphs that didn't change.
+
+A glyph's fingerprint is the SHA-1 of its width and of its point data (as
+drawn into a RecordingPointPen, which is much faster than iterating over the
+points), plus the fingerprints of the base glyphs of its components,
+recursively. So the fingerprint of a composite changes when one of its bases
+is edited, like the outlines it decomposes to.
+
+Works with defcon, fontParts and RoboFont glyphs.
+
+    fingerprints = OutlineFingerprints()
+    if fingerprints.glyph_fingerprint(glyph) != stored_fingerprint:
+        ...
+"""
+import hashlib
+
+from fontTools.pens.recordingPen import RecordingPointPen
+
+
+def points_fingerprint(glyph):
+    """Returns the SHA-1 of the width and point data of glyph, without
+       resolving its components."""
+    pen = RecordingPointPen()
+    glyph.drawPoints(pen)
+    sha = hashlib.sha1(repr((glyph.width, pen.value)).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _base_glyph(glyph, base_name):
+    layer = getattr(glyph, 'layer', None)
+    if layer is None:
+        layer = glyph.getParent()
+    if base_name in layer:
+        return layer[base_name]
+    return None
+
+
+class OutlineFingerprints(object):
+    """Fingerprints of the glyphs of one layer, with the components
+       resolved. Each glyph's fingerprint is computed once."""
+
+    def __init__(self):
+        self._fingerprints = {}  # glyph name -> fingerprint
+
+    def glyph_fingerprint(self, glyph):
+        fingerprint = self._fingerprints.get(glyph.name)
+        if fingerprint is not None:
+            return fingerprint
+
+        # a component that refers back to the glyph gets an empty one
+        self._fingerprints[glyph.name] = ''
+        pen = RecordingPointPen()
+        glyph.drawPoints(pen)
+        outline = [glyph.width, pen.value]
+        for component in glyph.components:
+            base_glyph = _base_glyph(glyph, component.baseGlyph)
+            if base_glyph is not None:
+                outline.append(self.glyph_fingerprint(base_glyph))
+        sha = hashlib.sha1(repr(outline).encode('utf-8'))
+
+        fingerprint = self._fingerprints[glyph.name] = sha.hexdigest()
+        return fingerprint
@@ -0,0 +1,198 @@
+"""
+Opt-in timing of the scripts, for finding out where their time goes.
+
+Profiling is off unless the PROFILE_ENV_VAR environment variable is set, or
+a script is run with --profile. Its value is the path of a file to which one
+JSON object per line is appended ('-' means standard error). Each script run
+on a font produces one line, holding the wall time of each of its phases
+(load, parse, apply, save), the counts it recorded (e.g. glyphs touched) and
+the total time:
+
+    {"script": "PlaceAnchors", "font": "MyFont.ufo", "pid": 4242,
+     "start": 1760000000.0, "total_s": 1.52,
+     "phases": {"load": 0.41, "apply": 0.78, "save": 0.33},
+     "counts": {"glyphs_touched": 312, "glyphs_written": 312}}
+
+Setting CPROFILE_ENV_VAR (or using --cprofile) to a folder also dumps the
+cProfile statistics of each run to a .prof file in that folder.
+
+    with profiled('PlaceAnchors', font_path):
+        with phase('load'):
+            font = Font(font_path)
+        count('glyphs_touched', len(glyph_names))
+
+Both settings are passed through the environment, so that the worker
+processes of shared.batch profile their runs too. When profiling is off,
+phase() and count() do nothing.
+"""
+from __future__ import print_function
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+
+PROFILE_ENV_VAR = 'ROBOFONT_SCRIPTS_PROFILE'
+CPROFILE_ENV_VAR = 'ROBOFONT_SCRIPTS_CPROFILE'
+
+# the records of the runs in progress in this process, innermost last
+_records = []
+_records_pid = os.getpid()
+_dump_count = 0
+
+
+class ProfileRecord(object):
+    """The timings and counts of one script run."""
+
+    def __init__(self, script, font_path=None):
+        self.script = script
+        self.font_path = font_path
+        self.start = time.time()
+        self.phases = {}
+        self.counts = {}
+
+    def add_time(self, phase_name, seconds):
+        self.phases[phase_name] = self.phases.get(phase_name, 0) + seconds
+
+    def add_count(self, count_name, value):
+        self.counts[count_name] = self.counts.get(count_name, 0) + value
+
+    def as_dict(self, total):
+        return {
+            'script': self.script,
+            'font': self.font_path,
+            'pid': os.getpid(),
+            'start': round(self.start, 3),
+            'total_s': round(total, 6),
+            'phases': dict((name, round(seconds, 6))
+                           for name, seconds in self.phases.items()),
+            'counts': self.counts,
+        }
+
+
+def add_profile_arguments(parser):
+    """Adds the --profile and --cprofile options to an argparse parser.
+       Call configure_profiling() with the parsed options."""
+    parser.add_argument(
+        '--profile', metavar='PATH', default=os.environ.get(PROFILE_ENV_VAR),
+        help='append the timings of each font to PATH, as JSON lines '
+             "('-' for standard error). Defaults to the %s environment "
+             'variable.' % PROFILE_ENV_VAR)
+    parser.add_argument(
+        '--cprofile', metavar='FOLDER',
+        default=os.environ.get(CPROFILE_ENV_VAR),
+        help='dump the cProfile statistics of each font to FOLDER. '
+             'Defaults to the %s environment variable.' % CPROFILE_ENV_VAR)
+
+
+def configure_profiling(options):
+    """Turns profiling on or off according to the options added by
+       add_profile_arguments()."""
+    for env_var, value in ((PROFILE_ENV_VAR, options.profile),
+                           (CPROFILE_ENV_VAR, options.cprofile)):
+        if value:
+            os.environ[env_var] = value
+        else:
+            os.environ.pop(env_var, None)
+
+
+def is_enabled():
+    return bool(os.environ.get(PROFILE_ENV_VAR) or
+                os.environ.get(CPROFILE_ENV_VAR))
+
+
+def _current_records():
+    """Returns the records of this process. A worker process forked while
+       a run was in progress starts with an empty list of its own."""
+    global _records, _records_pid
+    if _records_pid != os.getpid():
+        _records = []
+        _records_pid = os.getpid()
+    return _records
+
+
+def _write_record(line):
+    output_path = os.environ.get(PROFILE_ENV_VAR)
+    if not output_path:
+        return
+    if output_path == '-':
+        sys.stderr.write(line + '\n')
+        return
+    # a single write to a file opened for appending, so that the lines
+    # written by concurrent worker processes don't get interleaved
+    with io.open(output_path, 'ab') as output_file:
+        output_file.write((line + '\n').encode('utf-8'))
+
+
+def _dump_name(script, font_path):
+    global _dump_count
+    _dump_count += 1
+    name = script
+    if font_path:
+        name += '-' + os.path.basename(os.path.normpath(font_path))
+    return '%s-%d-%d.prof' % (name, os.getpid(), _dump_count)
+
+
+@contextlib.contextmanager
+def profiled(script, font_path=None):
+    """Records the phases and counts of a script run (on the font at
+       font_path, if given). Runs can be nested, e.g. one per font inside
+       one for the whole command; phase() and count() apply to the
+       innermost one."""
+    if not is_enabled():
+        yield None
+        return
+
+    records = _current_records()
+    profile = None
+    cprofile_folder = os.environ.get(CPROFILE_ENV_VAR)
+    # only one cProfile profiler can be active at a time, so nested runs
+    # are part of the dump of the outermost one
+    if cprofile_folder and not records:
+        import cProfile
+        profile = cProfile.Profile()
+
+    record = ProfileRecord(script, font_path)
+    records.append(record)
+    start = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield record
+    finally:
+        if profile is not None:
+            profile.disable()
+        total = time.perf_counter() - start
+        records.remove(record)
+        _write_record(json.dumps(record.as_dict(total), sort_keys=True))
+        if profile is not None:
+            if not os.path.isdir(cprofile_folder):
+                os.makedirs(cprofile_folder)
+            profile.dump_stats(os.path.join(
+                cprofile_folder, _dump_name(script, font_path)))
+
+
+@contextlib.contextmanager
+def phase(phase_name):
+    """Adds the time spent in the block to the named phase of the current
+       run. Time spent in the same phase more than once is summed."""
+    records = _current_records()
+    if not records:
+        yield
+        return
+    record = records[-1]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add_time(phase_name, time.perf_counter() - start)
+
+
+def count(count_name, value=1):
+    """Adds value to the named count of the current run."""
+    records = _current_records()
+    if records:
+        records[-1].add_count(count_name, value)
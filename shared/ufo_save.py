@@ -0,0 +1,78 @@
+"""
+Incremental saving of defcon fonts.
+
+defcon's Font.save() rewrites contents.plist, layerinfo.plist and all the
+font-level plists even when only a few glyphs were edited. save_glyphs()
+writes the .glif files of the named glyphs and nothing else, plus the
+layer's contents.plist and layerinfo.plist only when they actually changed.
+"""
+from __future__ import print_function
+
+import os
+
+from fontTools.ufoLib import UFOReader
+
+from .profiling import count, phase
+
+
+class _LayerInfo(object):
+    """Receives the data read from a layerinfo.plist file."""
+
+    def __init__(self):
+        self.color = None
+        self.lib = {}
+
+
+def _layer_info_changed(layer, glyph_set):
+    if glyph_set.ufoFormatVersionTuple.major < 3:
+        return False
+    on_disk = _LayerInfo()
+    glyph_set.readLayerInfo(on_disk, validateRead=False)
+    color = str(layer.color) if layer.color is not None else None
+    return (color, dict(layer.lib)) != (on_disk.color, dict(on_disk.lib))
+
+
+def save_glyphs(font, glyph_names, layer_name=None, dry_run=False):
+    """Writes the .glif files of the glyphs named in glyph_names (in the
+       default layer, unless layer_name is provided) to the font's UFO.
+       When dry_run is True nothing is written to disk.
+       Returns the sorted list of the names of the glyphs that were
+       (or would have been) written."""
+    glyph_names = sorted(glyph_names)
+    if dry_run or not glyph_names:
+        return glyph_names
+
+    with phase('save'):
+        _write_glyphs(font, glyph_names, layer_name)
+    count('glyphs_written', len(glyph_names))
+    return glyph_names
+
+
+def _write_glyphs(font, glyph_names, layer_name):
+    if font.path is None or not os.path.isdir(font.path):
+        # the font was never saved, or is a zipped UFO (.ufoz)
+        font.save()
+        return
+
+    if layer_name is None:
+        layer = font.layers.defaultLayer
+    else:
+        layer = font.layers[layer_name]
+
+    reader = UFOReader(font.path, validate=False)
+    try:
+        glyph_set = reader.getGlyphSet(
+            layer.name, validateRead=False, validateWrite=True)
+        contents_changed = False
+        for glyph_name in glyph_names:
+            glyph = layer[glyph_name]
+            if glyph_name not in glyph_set.contents:
+                contents_changed = True
+            glyph_set.writeGlyph(glyph_name, glyph, glyph.drawPoints)
+            glyph.dirty = False
+        if contents_changed:
+            glyph_set.writeContents()
+        if _layer_info_changed(layer, glyph_set):
+            glyph_set.writeLayerInfo(layer)
+    finally:
+        reader.close()